@@ -9,3 +9,10 @@ python manage.py migrate --noinput
 
 # Collect static files
 python manage.py collectstatic --noinput
+
+# Describe the dashboard carousel images once, not per request
+python manage.py build_carousel
+
+# Serve with `gunicorn nanays_kakanin.wsgi:application`. Live notifications
+# (LIVE_EVENTS_ENABLED=True) need ASGI workers instead, and
+# JOBS_RUN_INLINE=False needs `python manage.py run_worker`; see README.md
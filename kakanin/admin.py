@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Sum
-from .models import Product, Kakanin, AboutPage, ContactInfo, UserProfile, Order, OrderItem, Payment
+from django.utils import timezone
+from .models import (
+    Product, Kakanin, AboutPage, ContactInfo, UserProfile, Order, OrderItem, Payment, Job, CarouselImage,
+)
 
 
 @admin.register(Product)
@@ -55,6 +58,17 @@ class AboutAdmin(admin.ModelAdmin):
         return "-"
     photo_preview.short_description = "Photo"
 
+@admin.register(CarouselImage)
+class CarouselImageAdmin(admin.ModelAdmin):
+    list_display = ("image_preview", "alt", "sort_order", "is_active", "color")
+    list_editable = ("sort_order", "is_active")
+    readonly_fields = ("width", "height", "color")
+
+    def image_preview(self, obj):
+        return format_html('<img src="{}" style="height:40px; border-radius:5px;" />', obj.image.url)
+    image_preview.short_description = "Image"
+
+
 @admin.register(ContactInfo)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ("address", "phone", "email", "updated_at")
@@ -176,4 +190,14 @@ class PaymentAdmin(admin.ModelAdmin):
     proof_preview.short_description = "Payment Proof"
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'args', 'kwargs', 'attempts', 'locked_at', 'last_error', 'created_at')
+    actions = ['retry_jobs']
 
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0, run_at=timezone.now())
+        self.message_user(request, f"{updated} job(s) queued again.")
+    retry_jobs.short_description = "Retry selected failed jobs"
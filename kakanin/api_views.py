@@ -0,0 +1,116 @@
+"""
+Read-only JSON API for the shop front end and mobile clients
+
+GET /api/products/                        every product with its availability
+GET /api/products/?fields=id,name,price   only the listed fields
+GET /api/products/?available=1            only products shown in the user shop
+GET /api/products/?category=reservation&day=saturday
+                                          indexed SQL filters (KakaninQuerySet)
+
+Responses carry a strong ETag built from the catalog version and the next
+instant any product's availability changes, so a client revalidating with
+If-None-Match gets a 304 from the cache alone, without a database query.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from . import availability, catalog
+from .models import Kakanin, WEEKDAY_BITS
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+# Field name -> value of an annotated CatalogProduct
+PRODUCT_FIELDS = {
+    'id': lambda p: p.id,
+    'name': lambda p: p.name,
+    'price': lambda p: str(p.price),
+    'description': lambda p: p.description,
+    'categories': lambda p: p.categories,
+    'stock': lambda p: p.stock,
+    'image': lambda p: p.image_url or None,
+    'is_available': lambda p: p.is_available,
+    'available_today': lambda p: p.available_today,
+    'availability_display': lambda p: p.availability_display,
+    'allow_order_now': lambda p: p.allow_order_now,
+    'allow_reservation': lambda p: p.allow_reservation,
+    'min_order_quantity': lambda p: p.min_order_quantity,
+    'delivery_min_quantity': lambda p: p.delivery_min_quantity,
+    # Same rules as get_order_status / the shop pages (availability.py)
+    'order_status': lambda p: p.order_status,
+    'can_order': lambda p: p.can_order,
+    'available_now': lambda p: p.available_now,
+    'opens_at': lambda p: _iso(p.opens_at),
+    'closes_at': lambda p: _iso(p.closes_at),
+}
+
+
+def _parse_fields(request):
+    """Requested field names (all by default), or None if any is unknown"""
+    raw = request.GET.get('fields', '').strip()
+    if not raw:
+        return list(PRODUCT_FIELDS)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    if any(name not in PRODUCT_FIELDS for name in fields):
+        return None
+    return fields
+
+
+def _products(request):
+    """Catalog products matching the query filters, or None if a filter value is unknown"""
+    products = catalog.get_products()
+    if request.GET.get('available') in ('1', 'true'):
+        products = [p for p in products if p.is_available or p.available_today]
+    category = request.GET.get('category')
+    day = request.GET.get('day')
+    if category or day:
+        if (category and category not in dict(Kakanin.CATEGORY_CHOICES)) or (day and day not in WEEKDAY_BITS):
+            return None
+        queryset = Kakanin.objects.all()
+        if category:
+            queryset = queryset.in_category(category)
+        if day:
+            queryset = queryset.available_on(day)
+        ids = set(queryset.values_list('id', flat=True))
+        products = [p for p in products if p.id in ids]
+    return products
+
+
+def _products_etag(request):
+    """Changes with the catalog, the query and every availability transition"""
+    now = availability.local_now()
+    # Over the whole catalog, so revalidating never needs the filter queries
+    changes = [
+        change for change in (
+            availability.Schedule(product).next_change(now) for product in catalog.get_products()
+        ) if change
+    ]
+    next_change = min(changes).isoformat() if changes else '-'
+    query = '|'.join(request.GET.get(name, '') for name in ('fields', 'available', 'category', 'day'))
+    digest = hashlib.md5(f'{catalog.get_version()}|{next_change}|{query}'.encode()).hexdigest()
+    return f'products-{digest}'
+
+
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_products_etag)
+def api_products(request):
+    fields = _parse_fields(request)
+    if fields is None:
+        return JsonResponse(
+            {'error': f"Unknown field. Available fields: {', '.join(PRODUCT_FIELDS)}"}, status=400,
+        )
+    products = _products(request)
+    if products is None:
+        return JsonResponse({'error': 'Unknown category or day.'}, status=400)
+    now = availability.local_now()
+    products = availability.annotate(products, now)
+    return JsonResponse({
+        'count': len(products),
+        'products': [{name: PRODUCT_FIELDS[name](product) for name in fields} for product in products],
+    })
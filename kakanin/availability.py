@@ -0,0 +1,152 @@
+"""
+Availability engine for Kakanin products
+
+A product's categories, allow_order_now, available_days and
+available_from_time/available_to_time are compiled once into a Schedule.
+Everything is then evaluated against a single local ``now`` taken per
+request, so a whole catalog gets consistent answers (no product flips from
+open to closed half way through a page) and no per-product timezone work.
+
+    now = availability.local_now()
+    statuses = availability.evaluate(products, now)
+    statuses[product.id].order_status   # 'can_order' / 'order_closed' / 'reservation_only'
+    statuses[product.id].opens_in       # timedelta until the order window opens, or None
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+
+def local_now():
+    """Current time in the shop's timezone (settings.TIME_ZONE)"""
+    return timezone.localtime(timezone.now())
+
+
+class Schedule:
+    """Compiled availability rules of one product"""
+
+    __slots__ = (
+        'product_id', 'is_available', 'allow_order_now', 'reservation_only', 'order_now',
+        'weekdays', 'opens', 'closes',
+    )
+
+    def __init__(self, product):
+        categories = product.categories or []
+        self.product_id = product.id
+        self.is_available = product.is_available
+        self.allow_order_now = product.allow_order_now
+        self.reservation_only = 'reservation' in categories
+        self.order_now = 'order_now' in categories
+        # None means every day
+        self.weekdays = (
+            frozenset(WEEKDAYS.index(day) for day in product.available_days if day in WEEKDAYS)
+            if product.available_days else None
+        )
+        # Both ends are needed for a window; otherwise the product is open all day
+        if product.available_from_time and product.available_to_time:
+            self.opens, self.closes = product.available_from_time, product.available_to_time
+        else:
+            self.opens = self.closes = None
+
+    def in_window(self, now):
+        return self.opens is None or self.opens <= now.time() <= self.closes
+
+    def can_order(self, now):
+        """Inside the daily order window (available_days does not restrict ordering)"""
+        return self.allow_order_now and self.in_window(now)
+
+    def order_status(self, now):
+        """'reservation_only', 'order_closed' or 'can_order'"""
+        if self.reservation_only:
+            return 'reservation_only'
+        if self.order_now and not self.can_order(now):
+            return 'order_closed'
+        return 'can_order'
+
+    def is_available_at(self, now):
+        """Available on this weekday and inside the time window"""
+        if not self.is_available:
+            return False
+        if self.weekdays is not None and now.weekday() not in self.weekdays:
+            return False
+        return self.in_window(now)
+
+    def next_open(self, now):
+        """Next instant the order window opens, or None if it is open now or never opens"""
+        if not self.allow_order_now or self.opens is None or self.opens > self.closes:
+            return None
+        if self.in_window(now):
+            return None
+        opens_today = datetime.combine(now.date(), self.opens, now.tzinfo)
+        return opens_today if now < opens_today else opens_today + timedelta(days=1)
+
+    def next_close(self, now):
+        """Instant the order window closes, or None if it is closed now or never closes"""
+        if not self.allow_order_now or self.opens is None or not self.in_window(now):
+            return None
+        return datetime.combine(now.date(), self.closes, now.tzinfo)
+
+    def next_change(self, now):
+        """
+        Next instant after now at which order_status, can_order or is_available_at
+        can change: a window boundary, or midnight for weekday-restricted products.
+        None if the status never changes with time.
+        """
+        changes = []
+        if self.weekdays is not None:
+            changes.append(datetime.combine(now.date() + timedelta(days=1), time.min, now.tzinfo))
+        if self.opens is not None:
+            for boundary in (self.opens, self.closes):
+                at = datetime.combine(now.date(), boundary, now.tzinfo)
+                changes.append(at if at > now else at + timedelta(days=1))
+        return min(changes, default=None)
+
+
+class Status:
+    """Availability of one product at one instant, computed once"""
+
+    __slots__ = (
+        'order_status', 'can_order', 'available_now', 'opens_at', 'closes_at', 'opens_in', 'closes_in',
+        'changes_at',
+    )
+
+    def __init__(self, schedule, now):
+        self.order_status = schedule.order_status(now)
+        self.can_order = schedule.can_order(now)
+        self.available_now = schedule.is_available_at(now)
+        self.opens_at = schedule.next_open(now)
+        self.closes_at = schedule.next_close(now)
+        self.opens_in = self.opens_at - now if self.opens_at else None
+        self.closes_in = self.closes_at - now if self.closes_at else None
+        self.changes_at = schedule.next_change(now)
+
+
+def evaluate(products, now=None):
+    """Status of every product at the same instant, keyed by product id"""
+    now = now or local_now()
+    return {product.id: Status(Schedule(product), now) for product in products}
+
+
+def annotate(products, now=None):
+    """
+    Evaluate products in one pass and set the status on each one as attributes
+    (order_status, can_order, available_now, opens_at, closes_at, opens_in, closes_in,
+    changes_at).
+    Returns the products as a list.
+    """
+    products = list(products)
+    statuses = evaluate(products, now)
+    for product in products:
+        status = statuses[product.id]
+        for name in Status.__slots__:
+            setattr(product, name, getattr(status, name))
+    return products
+
+
+def is_closed(product, now=None):
+    """True for an 'order_now' product outside its order window (cart and checkout checks)"""
+    schedule = Schedule(product)
+    return schedule.order_now and not schedule.can_order(now or local_now())
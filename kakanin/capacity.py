@@ -0,0 +1,93 @@
+"""
+Per-day production capacity for reservations (Kakanin.max_daily_quantity)
+
+DailyCapacity holds, per (product, pickup date), the pieces reserved by
+active reservations and the pieces already completed. Every change is a
+single conditional UPDATE, so concurrent submissions from several workers
+can't push a day past its limit:
+
+    if not capacity.reserve(product, day, quantity): ...      # day is full
+    capacity.remaining(product, day)                          # one row lookup
+    capacity.remaining_by_day(product, start, days=30)        # date picker
+
+Views reserve when a reservation is created; the Reservation signals
+release the pieces when it is rejected, cancelled or deleted and move them
+to ``completed`` when it is completed.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import DailyCapacity
+
+
+# Statuses whose pieces are held in DailyCapacity.reserved
+ACTIVE_STATUSES = ('pending', 'pending_payment', 'confirmed')
+
+
+def _row(product_id, day):
+    DailyCapacity.objects.bulk_create(
+        [DailyCapacity(product_id=product_id, date=day)], ignore_conflicts=True,
+    )
+    return DailyCapacity.objects.filter(product_id=product_id, date=day)
+
+
+def reserve(product, day, quantity):
+    """Hold quantity pieces of product on day; False (nothing held) if that would exceed the limit"""
+    with transaction.atomic():
+        row = _row(product.id, day)
+        if product.max_daily_quantity is not None:
+            # reserved + completed + quantity <= max_daily_quantity, checked by the UPDATE itself
+            row = row.filter(reserved__lte=product.max_daily_quantity - quantity - F('completed'))
+        return row.update(reserved=F('reserved') + quantity) == 1
+
+
+def release(product_id, day, quantity):
+    """Give back pieces of a rejected, cancelled or deleted reservation"""
+    DailyCapacity.objects.filter(product_id=product_id, date=day, reserved__gte=quantity).update(
+        reserved=F('reserved') - quantity,
+    )
+
+
+def complete(product_id, day, quantity):
+    """Move a completed reservation's pieces from reserved to completed"""
+    updated = DailyCapacity.objects.filter(product_id=product_id, date=day, reserved__gte=quantity).update(
+        reserved=F('reserved') - quantity, completed=F('completed') + quantity,
+    )
+    if not updated:
+        # Not held (e.g. created outside the reservation views); still record the day's output
+        _row(product_id, day).update(completed=F('completed') + quantity)
+
+
+def remaining(product, day):
+    """Pieces still available on day, or None if the product has no daily limit"""
+    if product.max_daily_quantity is None:
+        return None
+    row = DailyCapacity.objects.filter(product_id=product.id, date=day).values('reserved', 'completed').first()
+    used = row['reserved'] + row['completed'] if row else 0
+    return max(product.max_daily_quantity - used, 0)
+
+
+def remaining_by_day(product, start, days=30):
+    """{date: pieces still available} for days dates from start (None values without a limit)"""
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    if product.max_daily_quantity is None:
+        return dict.fromkeys(dates)
+    used = {
+        row['date']: row['reserved'] + row['completed']
+        for row in DailyCapacity.objects.filter(
+            product_id=product.id, date__gte=dates[0], date__lte=dates[-1],
+        ).values('date', 'reserved', 'completed')
+    }
+    return {day: max(product.max_daily_quantity - used.get(day, 0), 0) for day in dates}
+
+
+def on_status_change(reservation, previous_status):
+    """Keep the ledger in step with a reservation leaving the active statuses"""
+    if previous_status not in ACTIVE_STATUSES or reservation.status in ACTIVE_STATUSES:
+        return
+    if reservation.status == 'completed':
+        complete(reservation.product_id, reservation.reservation_date, reservation.quantity)
+    else:
+        release(reservation.product_id, reservation.reservation_date, reservation.quantity)
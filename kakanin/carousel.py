@@ -0,0 +1,131 @@
+"""
+Images for the user dashboard carousel
+
+Bundled images (static/kakanin/img, minus logos and the GCash QR) are
+described once - hashed static URL, dimensions and dominant color for the
+loading placeholder - and kept in memory for the life of the process:
+
+    python manage.py build_carousel     # after collectstatic (build.sh)
+
+writes the descriptions to STATIC_ROOT/kakanin/carousel.json so web workers
+only read that file; without it the directory is scanned on first use.
+
+Active CarouselImage rows, managed in the Django admin, replace the bundled
+images. They are cached and refreshed whenever one is saved or deleted.
+"""
+import functools
+import json
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import transaction
+from PIL import Image
+
+from .models import CarouselImage
+
+
+STATIC_DIR = 'kakanin/img'
+SOURCE_DIR = os.path.join(os.path.dirname(__file__), 'static', 'kakanin', 'img')
+MANIFEST_PATH = os.path.join(settings.STATIC_ROOT, 'kakanin', 'carousel.json')
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg')
+EXCLUDE = ('logo', 'gcash')
+MAX_SLIDES = 6
+
+PLACEHOLDER_COLOR = '#f3f4f6'
+CACHE_KEY = 'carousel:overrides'
+# Per-process caches can't see another worker's invalidation; this bounds staleness
+CACHE_TIMEOUT = 300
+
+
+def dominant_color(image):
+    """Most common of a few quantized colors, as #rrggbb"""
+    small = image.convert('RGB')
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def describe(file):
+    """(width, height, color) of an image file or path; (None, None, placeholder) if Pillow can't read it"""
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            # JPEGs decode at a fraction of their size; enough for a color
+            image.draft('RGB', (256, 256))
+            return width, height, dominant_color(image)
+    except (OSError, ValueError):
+        # SVGs and broken files
+        return None, None, PLACEHOLDER_COLOR
+
+
+def scan():
+    """Describe the bundled images (reads every file; use the manifest or get_slides())"""
+    try:
+        names = sorted(os.listdir(SOURCE_DIR))
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        lower = name.lower()
+        if not lower.endswith(EXTENSIONS) or any(word in lower for word in EXCLUDE):
+            continue
+        width, height, color = describe(os.path.join(SOURCE_DIR, name))
+        entries.append({'path': f'{STATIC_DIR}/{name}', 'width': width, 'height': height, 'color': color})
+    return entries
+
+
+def write_manifest():
+    entries = scan()
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w') as file:
+        json.dump(entries, file, indent=2)
+    return entries
+
+
+def _static_url(path):
+    try:
+        return staticfiles_storage.url(path)
+    except ValueError:
+        # Not in the collectstatic manifest (e.g. added since the last deploy)
+        return settings.STATIC_URL + path
+
+
+@functools.lru_cache(maxsize=None)
+def get_bundled_slides():
+    """Bundled images with hashed URLs, described once per process"""
+    try:
+        with open(MANIFEST_PATH) as file:
+            entries = json.load(file)
+    except (FileNotFoundError, ValueError):
+        entries = scan()
+    return tuple(
+        {**entry, 'url': _static_url(entry['path']), 'alt': 'Kakanin image'}
+        for entry in entries[:MAX_SLIDES]
+    )
+
+
+def get_slides():
+    """Slides for the dashboard: the admin's active CarouselImages, else the bundled images"""
+    overrides = cache.get(CACHE_KEY)
+    if overrides is None:
+        overrides = [
+            {
+                'url': slide.image.url,
+                'width': slide.width,
+                'height': slide.height,
+                'color': slide.color or PLACEHOLDER_COLOR,
+                'alt': slide.alt,
+            }
+            for slide in CarouselImage.objects.filter(is_active=True)[:MAX_SLIDES]
+        ]
+        cache.set(CACHE_KEY, overrides, CACHE_TIMEOUT)
+    return overrides or get_bundled_slides()
+
+
+def invalidate():
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
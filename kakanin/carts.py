@@ -0,0 +1,87 @@
+"""
+Replies for the cart mutation views (add, update, remove, for both carts)
+
+A normal form post gets a flash message and a redirect, as always. Sent with
+``X-Requested-With: XMLHttpRequest`` (or ``Accept: application/json``) the
+same views answer with only what changed:
+
+    {"success": true, "message": "Cart updated.",
+     "line": {"product_id": 4, "quantity": 3, "subtotal": "45.00", "removed": false},
+     "cart": {"count": 2, "quantity": 5, "subtotal": "75.00"},
+     "badge": 3}
+
+so the cart page updates in place instead of rendering the shop or the cart
+(catalog, availability and navbar counts) again. Failures have
+"success": false and "error" instead of "message".
+"""
+from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from . import counters, pricing
+from .models import OrderCartItem, ReservationCartItem
+
+
+ORDER = 'order'
+RESERVATION = 'reservation'
+
+
+def wants_json(request):
+    return (
+        request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('Accept', '')
+    )
+
+
+def order_line(item, removed=False):
+    return {
+        'product_id': item.product_id,
+        'quantity': item.quantity,
+        'subtotal': str(item.get_subtotal()),
+        'removed': removed,
+    }
+
+
+def reservation_line(item, removed=False):
+    line = pricing.quote_reservation(pricing.snapshot([item])).lines[0]
+    return {
+        'item_id': item.id,
+        'product_id': item.product_id,
+        'quantity': item.quantity,
+        'subtotal': str(line.subtotal),
+        'downpayment': str(line.downpayment),
+        'removed': removed,
+    }
+
+
+def _totals(user, cart):
+    if cart == ORDER:
+        # OrderCart is keyed by its user
+        items = list(OrderCartItem.objects.filter(cart_id=user.id).select_related('product'))
+        quote = pricing.quote_order(pricing.snapshot(items))
+        return {'count': len(items), 'quantity': quote.total_quantity, 'subtotal': str(quote.subtotal)}
+    items = list(ReservationCartItem.objects.filter(cart__user=user).select_related('product'))
+    quote = pricing.quote_reservation(pricing.snapshot(items))
+    return {
+        'count': len(items),
+        'quantity': quote.total_quantity,
+        'total': str(quote.subtotal),
+        'downpayment': str(quote.downpayment),
+    }
+
+
+def reply(request, success, message, fallback, cart=ORDER, line=None):
+    """
+    JSON for wants_json() requests, else the flash message and a redirect
+    ``fallback`` is a URL name or path for the redirect.
+    """
+    if wants_json(request):
+        counts = counters.get_counts(request.user)
+        data = {'success': success, 'message' if success else 'error': message}
+        if line is not None:
+            data['line'] = line
+        data['cart'] = _totals(request.user, cart)
+        data['badge'] = counts[counters.ORDER_CART] + counts[counters.RESERVATION_CART]
+        return JsonResponse(data)
+    (messages.success if success else messages.error)(request, message)
+    return redirect(fallback)
@@ -0,0 +1,102 @@
+"""
+Cached, render-ready product catalog for the shop pages
+
+The product list is stored in the Django cache under a key that includes a
+catalog version. Saving or deleting a Kakanin (signals.py), or changing
+stock with a queryset update (call bump_version), moves to a new version, so
+readers never see a stale list and old entries simply expire.
+
+Cached products are CatalogProduct objects, not model instances: image URLs
+and image derivatives (images.py) are resolved once when the list is built
+instead of through the storage backend on every render, and the shop pages
+need no catalog queries on a warm cache.
+
+Each CatalogProduct also carries a content version used to key the cached
+shop product cards (see card_cache_key), so a card is re-rendered only when
+something it shows has changed.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+VERSION_KEY = 'catalog:version'
+
+# Per-process caches can't see another worker's bump; this bounds staleness
+CATALOG_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+# Card keys change with the product's content, so they can live much longer
+CARD_TIMEOUT = getattr(settings, 'PRODUCT_CARD_CACHE_TIMEOUT', 86400)
+
+
+class CatalogProduct:
+    """Snapshot of a Kakanin with everything the shop templates read"""
+
+    def __init__(self, product, image):
+        self.id = product.id
+        self.name = product.name
+        self.price = product.price
+        self.description = product.description
+        self.categories = product.categories or []
+        self.stock = product.stock
+        self.is_available = product.is_available
+        self.available_today = product.available_today
+        self.available_days = product.available_days
+        self.available_from_time = product.available_from_time
+        self.available_to_time = product.available_to_time
+        self.allow_order_now = product.allow_order_now
+        self.allow_reservation = product.allow_reservation
+        self.min_order_quantity = product.min_order_quantity
+        self.delivery_min_quantity = product.delivery_min_quantity
+        # images.Picture for {% responsive_image %}; image_url is the large copy for the detail modal
+        self.image = image
+        self.image_url = image.full_url if image else ''
+        self.availability_display = product.get_availability_display()
+        # Changes whenever any field above changes, i.e. on every save that matters to a card
+        self.version = hashlib.md5(repr(sorted(vars(self).items())).encode()).hexdigest()[:12]
+
+
+def card_cache_key(product):
+    """
+    vary_on values of a product card's {% cache %} fragment
+    product must have been through availability.annotate(): besides the content
+    version the key holds the computed order state and the next instant it can
+    change, so a card flips from open to closed (and back) exactly at the
+    available_from_time/available_to_time boundaries.
+    """
+    changes_at = product.changes_at.isoformat() if product.changes_at else '-'
+    return f'{product.id}:{product.version}:{product.order_status}:{int(product.can_order)}:{int(product.available_now)}:{changes_at}'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() so two workers racing on a cold cache agree on one version
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """Invalidate the cached catalog once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def get_products():
+    """Every product as a CatalogProduct, from the cache when warm"""
+    from . import images
+    from .models import Kakanin
+
+    key = f'catalog:products:{get_version()}'
+    products = cache.get(key)
+    if products is None:
+        rows = list(Kakanin.objects.order_by('id'))
+        variants = images.variants_for(product.image.name for product in rows if product.image)
+        products = [CatalogProduct(product, images.picture(product.image, variants)) for product in rows]
+        cache.set(key, products, CATALOG_TIMEOUT)
+    return products
+
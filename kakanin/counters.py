@@ -0,0 +1,96 @@
+"""
+Per-user navbar counters kept in the Django cache
+
+Counts are computed on a cache miss and dropped by the signal handlers in
+signals.py whenever a Notification, Message, OrderCartItem or
+ReservationCartItem changes,
+so the navbar normally costs a single cache get_many.
+
+Admin notifications are broadcast, so each staff member has their own
+unread count. A new admin notification bumps a shared generation key
+instead of touching every staff member's entry; entries cached under an
+older generation are recounted on their next read.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+NOTIFICATIONS = 'notifications'
+MESSAGES = 'messages'
+ORDER_CART = 'order_cart'
+RESERVATION_CART = 'reservation_cart'
+ADMIN_NOTIFICATIONS = 'admin_notifications'
+
+USER_COUNTERS = (NOTIFICATIONS, MESSAGES, ORDER_CART, RESERVATION_CART)
+
+ADMIN_GENERATION_KEY = 'navbar:admin:generation'
+
+# Upper bound on staleness when several workers use a per-process cache
+COUNTERS_TIMEOUT = getattr(settings, 'NAVBAR_COUNTERS_TIMEOUT', 300)
+
+
+def _key(user_id, name):
+    return f'navbar:{user_id}:{name}'
+
+
+def _compute(user_id, name):
+    """Count a single counter straight from the database"""
+    from .models import Notification, Message, OrderCartItem, ReservationCartItem
+
+    if name == NOTIFICATIONS:
+        return Notification.objects.filter(user_id=user_id, read=False).count()
+    if name == ADMIN_NOTIFICATIONS:
+        return Notification.admin_unread_for(user_id).count()
+    if name == MESSAGES:
+        return Message.objects.filter(recipient_id=user_id, is_read=False).count()
+    if name == ORDER_CART:
+        # OrderCart is keyed by its user
+        return OrderCartItem.objects.filter(cart_id=user_id).count()
+    if name == RESERVATION_CART:
+        return ReservationCartItem.objects.filter(cart__user_id=user_id).count()
+    raise ValueError(f'Unknown counter: {name}')
+
+
+def get_counts(user):
+    """
+    Return the navbar counters for a user as a dict keyed by counter name.
+    Staff users also get ADMIN_NOTIFICATIONS.
+    """
+    names = USER_COUNTERS + ((ADMIN_NOTIFICATIONS,) if user.is_staff else ())
+    keys = {_key(user.id, name): name for name in names}
+
+    cached = cache.get_many(list(keys) + [ADMIN_GENERATION_KEY])
+    generation = cached.get(ADMIN_GENERATION_KEY)
+    counts = {}
+    missing = {}
+    for key, name in keys.items():
+        if name == ADMIN_NOTIFICATIONS:
+            # Stored as (generation, count); an older generation is stale
+            entry = cached.get(key)
+            if entry is not None and entry[0] == generation:
+                counts[name] = entry[1]
+            else:
+                counts[name] = _compute(user.id, name)
+                missing[key] = (generation, counts[name])
+        elif key in cached:
+            counts[name] = cached[key]
+        else:
+            counts[name] = missing[key] = _compute(user.id, name)
+
+    if missing:
+        cache.set_many(missing, COUNTERS_TIMEOUT)
+    return counts
+
+
+def invalidate(user_id, *names):
+    """
+    Drop cached counters so the next read recomputes them.
+    Pass user_id=None for admin notifications (Notification.user is null);
+    that invalidates the admin count of every staff member at once.
+    """
+    if user_id is None:
+        cache.set(ADMIN_GENERATION_KEY, uuid.uuid4().hex, None)
+        return
+    cache.delete_many([_key(user_id, name) for name in names])
@@ -0,0 +1,169 @@
+"""
+Live events pushed to browsers over the server-sent events stream
+
+Signal handlers publish small JSON events to a channel ("user:<id>" for one
+user, "staff" for admin notifications) and views.live_events streams the
+channels of the connected user. The pub/sub backend is picked with the
+LIVE_EVENTS_BACKEND setting:
+
+- InProcessBackend keeps subscribers in memory, so it only reaches clients
+  connected to the process that published. Fine for a single worker.
+- DatabaseBackend (the default) writes events to the LiveEvent table and
+  subscribers poll it, so any worker can serve any client without an
+  outside service.
+
+The stream is off unless LIVE_EVENTS_ENABLED is set, and then must be served
+from the ASGI app (nanays_kakanin/asgi.py); under WSGI each open stream holds
+a whole worker. While it is off the notification pages poll their feeds.
+"""
+import asyncio
+import itertools
+import threading
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+STAFF_CHANNEL = 'staff'
+
+# Only with ASGI workers (see LIVE_EVENTS_ENABLED in settings)
+ENABLED = getattr(settings, 'LIVE_EVENTS_ENABLED', False)
+
+# Seconds between keepalive comments on an idle stream
+KEEPALIVE_INTERVAL = getattr(settings, 'LIVE_EVENTS_KEEPALIVE', 15)
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def channels_for(user):
+    """Channels a connected user listens to"""
+    channels = [user_channel(user.id)]
+    if user.is_staff:
+        channels.append(STAFF_CHANNEL)
+    return channels
+
+
+class InProcessBackend:
+    """Publish straight to asyncio queues of streams open in this process"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def publish(self, channel, data):
+        event = (next(self._ids), data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue, channels in subscribers:
+            if channel in channels:
+                try:
+                    # Publishers run in sync code, possibly on another thread
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+                except RuntimeError:
+                    # Event loop already closed; the stream is going away
+                    pass
+
+    async def listen(self, channels, last_event_id=None):
+        """Yield (id, data) for new events, or None when idle for KEEPALIVE_INTERVAL"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(), frozenset(channels))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class DatabaseBackend:
+    """Share events between workers through the LiveEvent table"""
+
+    poll_interval = getattr(settings, 'LIVE_EVENTS_POLL_INTERVAL', 2)
+    retention = timedelta(seconds=getattr(settings, 'LIVE_EVENTS_RETENTION', 3600))
+    prune_every = 100
+
+    def publish(self, channel, data):
+        from .models import LiveEvent
+
+        event = LiveEvent.objects.create(channel=channel, data=data)
+        # Events only matter to streams that are open now; trim the table now and then
+        if event.id % self.prune_every == 0:
+            LiveEvent.objects.filter(created_at__lt=timezone.now() - self.retention).delete()
+
+    async def listen(self, channels, last_event_id=None):
+        """Yield (id, data) for new events, or None when idle for KEEPALIVE_INTERVAL"""
+        from .models import LiveEvent
+
+        if last_event_id is None:
+            last_event_id = (await LiveEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+        idle = 0
+        while True:
+            found = False
+            async for event in LiveEvent.objects.filter(
+                channel__in=channels, id__gt=last_event_id
+            ).order_by('id')[:100]:
+                found = True
+                last_event_id = event.id
+                yield event.id, event.data
+            if found:
+                idle = 0
+            else:
+                idle += self.poll_interval
+                if idle >= KEEPALIVE_INTERVAL:
+                    idle = 0
+                    yield None
+            await asyncio.sleep(self.poll_interval)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'LIVE_EVENTS_BACKEND', 'kakanin.events.DatabaseBackend')
+    return import_string(path)()
+
+
+def publish(channel, data):
+    """Publish an event once the current transaction commits (nothing while the stream is off)"""
+    if not ENABLED:
+        return
+    transaction.on_commit(lambda: get_backend().publish(channel, data))
+
+
+def publish_notification(notification):
+    if notification.user_id:
+        channel = user_channel(notification.user_id)
+        url = reverse('mark_notification_read', args=[notification.id])
+    else:
+        channel = STAFF_CHANNEL
+        url = reverse('admin_mark_notification_read', args=[notification.id])
+    publish(channel, {
+        'type': 'notification',
+        'id': notification.id,
+        'notification_type': notification.type,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+        'url': url,
+    })
+
+
+def publish_message(message):
+    publish(user_channel(message.recipient_id), {
+        'type': 'message',
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'preview': message.body[:100],
+        'created_at': message.created_at.isoformat(),
+        'url': reverse('message_thread', args=[message.sender_id]) if message.sender_id else reverse('messages_inbox'),
+    })
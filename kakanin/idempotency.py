@@ -0,0 +1,110 @@
+"""
+Idempotency keys for the forms that create orders and reservations
+
+On slow mobile connections customers double-tap and browsers retry, posting
+the same form twice. Each of these forms carries a one-time token
+
+    {% load kakanin_forms %}
+    <form method="post">{% csrf_token %}{% idempotency_field %} ...
+
+and its view is wrapped with @idempotent('reservation_list'). The first POST
+of a token claims it (a unique IdempotencyKey row). When the view created
+something it calls mark_submitted(request) before redirecting; that redirect
+is recorded and repeats get it without running the view, so no second
+order, notification or upload. A repeat arriving while the first is still
+running is sent to the fallback page instead. Any other answer (a validation
+error redirect, the form again) releases the token, so the customer can fix
+the form and submit it again.
+
+Tokens are honoured for IDEMPOTENCY_KEY_TTL seconds; older rows are pruned
+as new tokens are claimed. POSTs without a token run as before.
+"""
+import functools
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseRedirect
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+FIELD = 'idempotency_key'
+SUBMITTED_ATTR = '_idempotency_submitted'
+TTL = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+PRUNE_EVERY = 100
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def _claim(user, key, scope):
+    """(new row, None) if this is the token's first use, else (None, the earlier row or None)"""
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, scope=scope), None
+        except IntegrityError:
+            expired_before = timezone.now() - TTL
+            existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if existing is not None and existing.created_at >= expired_before:
+                return None, existing
+            # Expired (or removed meanwhile): the token counts as new again
+            IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=expired_before).delete()
+    return None, None
+
+
+def mark_submitted(request):
+    """Record the redirect this idempotent view is about to return as the token's result"""
+    setattr(request, SUBMITTED_ATTR, True)
+
+
+def _prune():
+    IdempotencyKey.objects.filter(created_at__lt=timezone.now() - TTL).delete()
+
+
+def idempotent(pending_url):
+    """
+    Run a POST view once per form token; repeats replay its redirect
+    ``pending_url`` (URL name or path) answers repeats while the first is still running.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.POST.get(FIELD, '').strip()[:64] if request.method == 'POST' else ''
+            if not key:
+                return view(request, *args, **kwargs)
+
+            claimed, earlier = _claim(request.user, key, view.__name__)
+            if claimed is None:
+                if earlier is not None and earlier.status_code:
+                    messages.info(request, 'This form was already submitted. Showing the result of that submission.')
+                    response = HttpResponseRedirect(earlier.location)
+                    response.status_code = earlier.status_code
+                    return response
+                messages.info(request, 'Your submission is still being processed.')
+                return redirect(pending_url)
+            # Tokens only matter for a short while; trim the table now and then
+            if claimed.id % PRUNE_EVERY == 0:
+                _prune()
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                claimed.delete()
+                raise
+            if getattr(request, SUBMITTED_ATTR, False) and response.status_code in (301, 302, 303, 307, 308):
+                claimed.status_code = response.status_code
+                claimed.location = response['Location'][:500]
+                claimed.save(update_fields=['status_code', 'location'])
+            else:
+                # Nothing was created (e.g. a validation error); let the token be reused
+                claimed.delete()
+            return response
+        return wrapper
+    return decorator
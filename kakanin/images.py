@@ -0,0 +1,169 @@
+"""
+Responsive image derivatives for uploaded photos
+
+When a product image, profile picture, About page photo or message image is
+uploaded, a worker job (tasks.generate_image_derivatives) resizes it to the
+fixed widths in SIZES, encodes each one as WebP and JPEG and saves them
+through the default storage next to the original:
+
+    kakanin_images/puto.jpg -> kakanin_images/derivatives/puto_card.webp, ...
+
+Templates then use {% responsive_image %} (templatetags/kakanin_images.py),
+which emits a <picture> with srcset/sizes so phones download the smallest
+copy that fits. Until the job has run the original is served as before.
+"""
+import io
+import posixpath
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import ImageDerivative
+
+
+# (size, width in px); sources narrower than a width are not upscaled
+SIZES = (
+    ('thumb', 160),
+    ('card', 480),
+    ('full', 1200),
+)
+
+# (format, Pillow format, MIME type), preferred first
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpeg', 'JPEG', 'image/jpeg'),
+)
+
+QUALITY = 80
+
+VARIANTS_TIMEOUT = 60 * 60 * 24
+# Images without derivatives yet are looked up again soon
+MISSING_TIMEOUT = 60
+
+
+def derivative_name(source, size, extension):
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'derivatives', f'{stem}_{size}.{extension}')
+
+
+def _open(source):
+    with default_storage.open(source, 'rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # JPEG has no alpha; flatten transparent PNGs onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate(source):
+    """
+    Create and store every derivative of the stored image ``source``
+    Returns the variant dicts, also saved on the source's ImageDerivative row.
+    Raises FileNotFoundError / PIL.UnidentifiedImageError for missing or non-image files.
+    """
+    image = _open(source)
+    variants = []
+    done_widths = set()
+    for size, width in SIZES:
+        width = min(width, image.width)
+        if width in done_widths:
+            # Small original: reuse the largest copy instead of storing duplicates
+            variants.extend([dict(variant, size=size) for variant in variants if variant['width'] == width])
+            continue
+        done_widths.add(width)
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for extension, pillow_format, _ in FORMATS:
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, quality=QUALITY, optimize=pillow_format == 'JPEG')
+            name = derivative_name(source, size, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({
+                'size': size,
+                'width': width,
+                'height': height,
+                'format': extension,
+                'name': name,
+                'url': default_storage.url(name),
+            })
+    ImageDerivative.objects.update_or_create(source=source, defaults={'variants': variants})
+    cache.set(_cache_key(source), variants, VARIANTS_TIMEOUT)
+    return variants
+
+
+def _cache_key(source):
+    return f'images:variants:{source}'
+
+
+def variants_for(sources):
+    """{source: variants} for storage names, [] for images without derivatives (cached)"""
+    sources = [source for source in set(sources) if source]
+    if not sources:
+        return {}
+    keys = {_cache_key(source): source for source in sources}
+    found = {keys[key]: variants for key, variants in cache.get_many(list(keys)).items()}
+    missing = [source for source in sources if source not in found]
+    if missing:
+        stored = dict(ImageDerivative.objects.filter(source__in=missing).values_list('source', 'variants'))
+        for source in missing:
+            variants = stored.get(source, [])
+            found[source] = variants
+            cache.set(_cache_key(source), variants, VARIANTS_TIMEOUT if variants else MISSING_TIMEOUT)
+    return found
+
+
+def srcset(variants, extension):
+    """'url 160w, url 480w, ...' for one format"""
+    seen = set()
+    candidates = []
+    for variant in variants:
+        if variant['format'] == extension and variant['width'] not in seen:
+            seen.add(variant['width'])
+            candidates.append(f"{variant['url']} {variant['width']}w")
+    return ', '.join(candidates)
+
+
+def variant_url(variants, size, extension='jpeg'):
+    for variant in variants:
+        if variant['size'] == size and variant['format'] == extension:
+            return variant['url']
+    return None
+
+
+class Picture:
+    """Picklable stand-in for an ImageField file with its derivatives resolved (catalog.py)"""
+
+    __slots__ = ('name', 'url', 'variants')
+
+    def __init__(self, name, url, variants):
+        self.name = name
+        self.url = url
+        self.variants = variants
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __repr__(self):
+        return f'Picture({self.name!r}, {len(self.variants)} variants)'
+
+    @property
+    def full_url(self):
+        """Largest derivative, for detail views; the original while none exist"""
+        return variant_url(self.variants, 'full') or self.url
+
+
+def picture(field_file, variants):
+    """Picture for an ImageField file, given variants_for() of the batch it belongs to"""
+    if not field_file:
+        return Picture('', '', [])
+    return Picture(field_file.name, field_file.url, variants.get(field_file.name, []))
@@ -0,0 +1,230 @@
+"""
+Small database-backed job queue for side effects that don't need to finish
+inside the request (notifications, uploads)
+
+    from .jobs import enqueue
+    enqueue(tasks.notify_order_status, order.id, order.user_id, order.status)
+
+enqueue() inserts a Job row in the caller's transaction, so the job runs if
+and only if the request's writes commit. ``manage.py run_worker`` claims due
+jobs, runs them and retries failures with exponential backoff.
+
+Without a worker (JOBS_RUN_INLINE, the default) the web process runs the
+request's jobs itself once the response has been sent (the request_finished
+receiver in signals.py), through the same claim/retry path, and then picks
+up a few due retries. A failing job is logged and stays queued; it never
+reaches the customer. Tasks registered with @task(cpu_bound=True) go to a
+process pool instead, so they don't hold the web worker either.
+"""
+import logging
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 10  # seconds; doubles after every failed attempt
+RETRY_MAX_DELAY = 3600
+# A job still "running" after this long is assumed lost with its worker
+LOCK_TIMEOUT = timedelta(minutes=10)
+# Due retries an inline run picks up after the request's own jobs
+INLINE_RETRIES = 5
+PROCESS_POOL_SIZE = getattr(settings, 'JOBS_PROCESS_POOL_SIZE', 2)
+
+_registry = {}
+_local = threading.local()
+_pool = None
+
+
+def task(func=None, *, cpu_bound=False):
+    """
+    Register a function as a job; enqueue it with enqueue(func, ...)
+    Inline, cpu_bound tasks run in a process pool rather than the web worker.
+    """
+    def register(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.cpu_bound = cpu_bound
+        _registry[func.job_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    if name not in _registry:
+        # Importing the module registers its tasks
+        import_string(name)
+    return _registry[name]
+
+
+def enqueue(func, *args, run_at=None, max_attempts=MAX_ATTEMPTS, **kwargs):
+    """
+    Queue func(*args, **kwargs) for a worker
+    Arguments must be JSON serializable; pass ids rather than model instances.
+    """
+    from .models import Job
+
+    job = Job.objects.create(
+        name=func.job_name,
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+    if getattr(settings, 'JOBS_RUN_INLINE', True):
+        transaction.on_commit(lambda: _run_after_response(job.id))
+    return job
+
+
+def start_request():
+    _local.pending = []
+
+
+def finish_request():
+    """Run the jobs the request queued, now that its response has been sent"""
+    pending, _local.pending = getattr(_local, 'pending', None), None
+    if pending:
+        run_inline(pending)
+
+
+def _run_after_response(job_id):
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        # Not in a request (shell, management command): run right away
+        run_inline([job_id])
+    else:
+        pending.append(job_id)
+
+
+def run_inline(job_ids):
+    """Run the given jobs, then a few due retries; failures are logged and left queued"""
+    try:
+        for pk in job_ids:
+            job = claim(pk)
+            if job is not None:
+                _dispatch(job)
+        for _ in range(INLINE_RETRIES):
+            job = claim_next()
+            if job is None:
+                break
+            _dispatch(job)
+    except Exception:
+        # e.g. the database went away; whatever is unclaimed stays pending
+        logger.exception('Running jobs inline failed')
+
+
+def _dispatch(job):
+    if getattr(get_task(job.name), 'cpu_bound', False):
+        _process_pool().submit(_run_in_process, job.id)
+    else:
+        run_job(job)
+
+
+def _process_pool():
+    global _pool
+    if _pool is None:
+        # spawn: children set Django up themselves instead of sharing the
+        # parent's database connections
+        _pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_SIZE,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_process,
+        )
+    return _pool
+
+
+def _init_process():
+    import django
+
+    django.setup()
+
+
+def _run_in_process(job_id):
+    from .models import Job
+
+    job = Job.objects.filter(pk=job_id, status='running').first()
+    if job is not None:
+        run_job(job)
+    close_old_connections()
+
+
+def _claimable(now):
+    return Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=now - LOCK_TIMEOUT)
+
+
+def claim(pk):
+    """Take the job with this pk if it is due, else None"""
+    from .models import Job
+
+    now = timezone.now()
+    claimed = Job.objects.filter(_claimable(now), pk=pk).update(
+        status='running', locked_at=now, attempts=F('attempts') + 1
+    )
+    return Job.objects.get(pk=pk) if claimed else None
+
+
+def claim_next():
+    """
+    Take the next due job, or None when the queue is empty
+    The conditional UPDATE makes claiming safe with several workers on any
+    backend (no SELECT ... FOR UPDATE SKIP LOCKED on SQLite).
+    """
+    from .models import Job
+
+    now = timezone.now()
+    candidates = Job.objects.filter(_claimable(now)).order_by('run_at').values_list('id', flat=True)[:10]
+    for pk in candidates:
+        job = claim(pk)
+        if job is not None:
+            return job
+    return None
+
+
+def run_job(job):
+    """Run a claimed job; finished jobs are deleted, failures are retried or marked failed"""
+    try:
+        get_task(job.name)(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.name, job.attempts)
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            delay = min(RETRY_BASE_DELAY * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+            job.status = 'pending'
+            job.run_at = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+        return False
+    job.delete()
+    return True
+
+
+def work(stop_event=None, sleep=1.0, burst=False):
+    """
+    Worker loop: run jobs until stop_event is set
+    With burst=True return as soon as no job is due. Returns the number of jobs run.
+    """
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        job = claim_next()
+        if job is None:
+            if burst:
+                break
+            stop_event.wait(sleep)
+            continue
+        run_job(job)
+        processed += 1
+    close_old_connections()
+    return processed
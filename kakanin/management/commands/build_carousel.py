@@ -0,0 +1,17 @@
+"""
+Django management command to describe the bundled dashboard carousel images
+Usage: python manage.py build_carousel   (after collectstatic, see build.sh)
+"""
+from django.core.management.base import BaseCommand
+
+from kakanin import carousel
+
+
+class Command(BaseCommand):
+    help = 'Record size and placeholder color of the bundled carousel images'
+
+    def handle(self, *args, **options):
+        entries = carousel.write_manifest()
+        for entry in entries:
+            self.stdout.write(f"  {entry['path']}: {entry['width']}x{entry['height']} {entry['color']}")
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {len(entries)} images to {carousel.MANIFEST_PATH}'))
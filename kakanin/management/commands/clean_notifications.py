@@ -1,89 +1,146 @@
 """
 Django management command to clean up old notifications
-Usage: python manage.py clean_notifications
+Usage: python manage.py clean_notifications [--apply] [--dry-run] [--max-seconds 60]
+
+Without options it only shows statistics. --apply deletes by the retention
+policies in kakanin.retention and never prompts, so it can run from cron or
+a scheduled job. --all, --read and --old ask for confirmation unless --yes.
 """
+import time
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from kakanin import retention
 from kakanin.models import Notification
 
 
 class Command(BaseCommand):
-    help = 'Clean up old notifications from the database'
+    help = 'Delete notifications past their retention period, in batches'
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Delete notifications past the retention policies (for scheduled runs)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many notifications would be deleted',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=retention.BATCH_SIZE,
+            help=f'Rows deleted per transaction (default {retention.BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            help='Stop after this many seconds; the next run picks up the rest',
+        )
         parser.add_argument(
             '--all',
             action='store_true',
-            help='Delete all notifications',
+            help='Delete all notifications instead of applying the policies',
         )
         parser.add_argument(
             '--read',
             action='store_true',
-            help='Delete only read notifications',
+            help='Delete all read notifications instead of applying the policies',
         )
         parser.add_argument(
             '--old',
             type=int,
-            help='Delete notifications older than X days',
+            help='Delete notifications older than X days instead of applying the policies',
+        )
+        parser.add_argument(
+            '--yes',
+            action='store_true',
+            help='Don\'t ask before deleting with --all, --read or --old',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Show notification statistics and exit (the default)',
         )
 
     def handle(self, *args, **options):
         if options['all']:
-            # Delete all notifications
-            count = Notification.objects.count()
-            self.stdout.write(f"Found {count} notifications")
-            
-            confirm = input("Delete all notifications? (yes/no): ")
-            if confirm.lower() == 'yes':
-                deleted = Notification.objects.all().delete()[0]
-                self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} notifications'))
-            else:
-                self.stdout.write(self.style.WARNING('❌ Cancelled'))
-        
+            targets = [('all', Notification.objects.all())]
         elif options['read']:
-            # Delete only read notifications
-            count = Notification.objects.filter(read=True).count()
-            self.stdout.write(f"Found {count} read notifications")
-            
-            confirm = input("Delete read notifications? (yes/no): ")
-            if confirm.lower() == 'yes':
-                deleted = Notification.objects.filter(read=True).delete()[0]
-                self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} read notifications'))
-            else:
-                self.stdout.write(self.style.WARNING('❌ Cancelled'))
-        
+            targets = [('read', Notification.objects.filter(read=True))]
         elif options['old']:
-            # Delete notifications older than X days
-            from django.utils import timezone
-            from datetime import timedelta
-            
-            days = options['old']
-            cutoff_date = timezone.now() - timedelta(days=days)
-            count = Notification.objects.filter(created_at__lt=cutoff_date).count()
-            
-            self.stdout.write(f"Found {count} notifications older than {days} days")
-            
-            confirm = input(f"Delete notifications older than {days} days? (yes/no): ")
-            if confirm.lower() == 'yes':
-                deleted = Notification.objects.filter(created_at__lt=cutoff_date).delete()[0]
-                self.stdout.write(self.style.SUCCESS(f'✅ Deleted {deleted} old notifications'))
+            cutoff_date = timezone.now() - timedelta(days=options['old'])
+            targets = [(f"older than {options['old']} days", Notification.objects.filter(created_at__lt=cutoff_date))]
+        else:
+            targets = None
+
+        if options['stats'] or (targets is None and not options['apply'] and not options['dry_run']):
+            return self.show_stats()
+
+        if options['dry_run']:
+            if targets is None:
+                results = retention.purge_expired_notifications(dry_run=True)
             else:
+                results = [(label, queryset.count(), True) for label, queryset in targets]
+            for label, count, _ in results:
+                self.stdout.write(f"Would delete {count} {label} notifications")
+            return
+
+        if targets is not None and not options['yes']:
+            label, queryset = targets[0]
+            self.stdout.write(f"Found {queryset.count()} {label} notifications")
+            confirm = input(f"Delete {label} notifications? (yes/no): ")
+            if confirm.lower() != 'yes':
                 self.stdout.write(self.style.WARNING('❌ Cancelled'))
-        
+                return
+
+        def progress(label, deleted):
+            self.stdout.write(f"  {label}: deleted {deleted}")
+
+        if targets is None:
+            results = retention.purge_expired_notifications(
+                batch_size=options['batch_size'],
+                max_seconds=options['max_seconds'],
+                progress=progress,
+            )
         else:
-            # Show statistics
-            total = Notification.objects.count()
-            admin = Notification.objects.filter(user__isnull=True).count()
-            user = Notification.objects.filter(user__isnull=False).count()
-            read = Notification.objects.filter(read=True).count()
-            unread = Notification.objects.filter(read=False).count()
-            
-            self.stdout.write("\n📊 Notification Statistics:")
-            self.stdout.write(f"  Total: {total}")
-            self.stdout.write(f"  Admin notifications: {admin}")
-            self.stdout.write(f"  User notifications: {user}")
-            self.stdout.write(f"  Read: {read}")
-            self.stdout.write(f"  Unread: {unread}")
-            self.stdout.write("\nUsage:")
-            self.stdout.write("  python manage.py clean_notifications --all     # Delete all")
-            self.stdout.write("  python manage.py clean_notifications --read    # Delete read only")
-            self.stdout.write("  python manage.py clean_notifications --old 30  # Delete older than 30 days")
+            deadline = time.monotonic() + options['max_seconds'] if options['max_seconds'] else None
+            results = []
+            for label, queryset in targets:
+                deleted, finished = retention.delete_in_batches(
+                    queryset, options['batch_size'], deadline,
+                    lambda count, label=label: progress(label, count),
+                )
+                results.append((label, deleted, finished))
+
+        total = sum(count for _, count, _ in results)
+        if all(finished for _, _, finished in results):
+            self.stdout.write(self.style.SUCCESS(f'✅ Deleted {total} notifications'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'⏱ Deleted {total} notifications; stopped at --max-seconds, run again to continue'
+            ))
+
+    def show_stats(self):
+        total = Notification.objects.count()
+        admin = Notification.objects.filter(user__isnull=True).count()
+        user = Notification.objects.filter(user__isnull=False).count()
+        read = Notification.objects.filter(read=True).count()
+        unread = Notification.objects.filter(read=False).count()
+
+        self.stdout.write("\n📊 Notification Statistics:")
+        self.stdout.write(f"  Total: {total}")
+        self.stdout.write(f"  Admin notifications: {admin}")
+        self.stdout.write(f"  User notifications: {user}")
+        self.stdout.write(f"  Read: {read}")
+        self.stdout.write(f"  Unread: {unread}")
+        self.stdout.write("\nUsage:")
+        self.stdout.write("  python manage.py clean_notifications --apply    # Apply retention policies")
+        self.stdout.write("  python manage.py clean_notifications --dry-run  # Show what they would delete")
+        self.stdout.write("  python manage.py clean_notifications --all      # Delete all (asks first)")
+        self.stdout.write("  python manage.py clean_notifications --read     # Delete read only (asks first)")
+        self.stdout.write("  python manage.py clean_notifications --old 30   # Delete older than 30 days (asks first)")
@@ -0,0 +1,84 @@
+"""
+Django management command to run background jobs queued with kakanin.jobs.enqueue
+Usage: python manage.py run_worker [--concurrency 4] [--pool thread|process] [--burst]
+"""
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from kakanin import jobs
+
+
+def _run_process(sleep, burst):
+    # Each process stops on SIGTERM/SIGINT and gets its own DB connections
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    jobs.work(stop_event, sleep=sleep, burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (notifications, uploads) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of worker threads or processes (default 1)',
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default='thread',
+            help='Run workers as threads (default) or processes',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default 1)',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        sleep = options['sleep']
+        burst = options['burst']
+        self.stdout.write(f"Starting {concurrency} {options['pool']} worker(s)")
+
+        if options['pool'] == 'process':
+            # Don't share the parent's database connections with the children
+            connections.close_all()
+            workers = [
+                multiprocessing.Process(target=_run_process, args=(sleep, burst), daemon=True)
+                for _ in range(concurrency)
+            ]
+        else:
+            stop_event = threading.Event()
+            workers = [
+                threading.Thread(target=jobs.work, args=(stop_event, sleep, burst), daemon=True)
+                for _ in range(concurrency)
+            ]
+            signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping after the current jobs...'))
+            if options['pool'] == 'thread':
+                stop_event.set()
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS('✅ Worker stopped'))
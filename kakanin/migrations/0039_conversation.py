@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_conversations(apps, schema_editor):
+    """Create one Conversation per existing two-person thread"""
+    Message = apps.get_model('kakanin', 'Message')
+    Conversation = apps.get_model('kakanin', 'Conversation')
+
+    threads = {}
+    rows = Message.objects.filter(sender__isnull=False).order_by('created_at').values_list(
+        'id', 'sender_id', 'recipient_id', 'created_at', 'is_read'
+    )
+    for message_id, sender_id, recipient_id, created_at, is_read in rows.iterator():
+        low, high = sorted((sender_id, recipient_id))
+        thread = threads.setdefault((low, high), {'unread_low': 0, 'unread_high': 0})
+        thread['last_message_id'] = message_id
+        thread['last_activity'] = created_at
+        if not is_read:
+            thread['unread_low' if recipient_id == low else 'unread_high'] += 1
+
+    Conversation.objects.bulk_create(
+        [Conversation(user_low_id=low, user_high_id=high, **data) for (low, high), data in threads.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0038_product'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now)),
+                ('unread_low', models.PositiveIntegerField(default=0, help_text='Unread messages addressed to user_low')),
+                ('unread_high', models.PositiveIntegerField(default=0, help_text='Unread messages addressed to user_high')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='kakanin.message')),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_activity'],
+                'indexes': [models.Index(fields=['user_low', '-last_activity'], name='conversation_low_activity'), models.Index(fields=['user_high', '-last_activity'], name='conversation_high_activity')],
+                'constraints': [models.UniqueConstraint(fields=('user_low', 'user_high'), name='unique_conversation_participants')],
+            },
+        ),
+        migrations.RunPython(build_conversations, migrations.RunPython.noop),
+    ]
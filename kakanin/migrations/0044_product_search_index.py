@@ -0,0 +1,82 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Frozen copies of kakanin.search as of this migration, so later changes to
+# the module don't change what this migration does
+FTS_TABLE = 'kakanin_product_fts'
+
+_FOLDS = [
+    ('ch', 'ts'),
+    ('qu', 'k'),
+    ('ng', 'n'),
+    ('ph', 'p'),
+    ('x', 'ks'),
+    ('c', 'k'),
+    ('f', 'p'),
+    ('v', 'b'),
+    ('z', 's'),
+    ('j', 'h'),
+    ('e', 'i'),
+    ('o', 'u'),
+]
+_SOFT_C = re.compile(r'c(?=[eiy])')
+_DOUBLE = re.compile(r'(.)\1+')
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    text = _SOFT_C.sub('s', text)
+    for spelling, folded in _FOLDS:
+        text = text.replace(spelling, folded)
+    return ' '.join(_DOUBLE.sub(r'\1', word) for word in _WORD.findall(text))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, description, tokenize = 'unicode61')"
+        )
+        insert = f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)'
+    elif vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE kakanin_kakanin ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX kakanin_kakanin_search_vector ON kakanin_kakanin USING GIN (search_vector)'
+        )
+        insert = (
+            "UPDATE kakanin_kakanin SET search_vector = "
+            "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') "
+            "WHERE id = %s"
+        )
+    else:
+        return
+
+    Kakanin = apps.get_model('kakanin', 'Kakanin')
+    for product_id, name, description in Kakanin.objects.values_list('id', 'name', 'description'):
+        params = [normalize(name), normalize(description)]
+        params = [product_id] + params if vendor == 'sqlite' else params + [product_id]
+        schema_editor.execute(insert, params)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS kakanin_kakanin_search_vector')
+        schema_editor.execute('ALTER TABLE kakanin_kakanin DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0043_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0045_imagederivative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarouselImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='carousel/')),
+                ('alt', models.CharField(blank=True, default='Kakanin image', max_length=150)),
+                ('sort_order', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('width', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('color', models.CharField(blank=True, editable=False, help_text='Dominant color, shown while loading', max_length=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+    ]
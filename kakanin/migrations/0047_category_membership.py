@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of kakanin.models.weekday_mask as of this migration
+WEEKDAY_BITS = {
+    day: 1 << index
+    for index, day in enumerate(('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'))
+}
+
+
+def weekday_mask(days):
+    mask = 0
+    for day in days or []:
+        mask |= WEEKDAY_BITS.get(day, 0)
+    return mask
+
+
+def backfill(apps, schema_editor):
+    Kakanin = apps.get_model('kakanin', 'Kakanin')
+    KakaninCategory = apps.get_model('kakanin', 'KakaninCategory')
+    rows = []
+    for product in Kakanin.objects.only('id', 'categories', 'available_days'):
+        mask = weekday_mask(product.available_days)
+        if mask:
+            Kakanin.objects.filter(id=product.id).update(available_days_mask=mask)
+        rows.extend(
+            KakaninCategory(product_id=product.id, category=category)
+            for category in set(product.categories or [])
+        )
+    KakaninCategory.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0046_carouselimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kakanin',
+            name='available_days_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='KakaninCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('available_now', 'Available Now'), ('reservation', 'For Reservation'), ('order_now', 'Order Now')], max_length=20)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_rows', to='kakanin.kakanin')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'product'], name='kakanincategory_category')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'category'), name='unique_kakanin_category')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
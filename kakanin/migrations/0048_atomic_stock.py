@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0047_category_membership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_deducted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='kakanin',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='kakanin_stock_non_negative'),
+        ),
+    ]
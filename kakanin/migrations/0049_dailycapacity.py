@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill(apps, schema_editor):
+    Reservation = apps.get_model('kakanin', 'Reservation')
+    DailyCapacity = apps.get_model('kakanin', 'DailyCapacity')
+    ledger = {}
+    totals = (
+        Reservation.objects.filter(status__in=['pending', 'pending_payment', 'confirmed', 'completed'])
+        .values('product_id', 'reservation_date', 'status').order_by().annotate(pieces=Sum('quantity'))
+    )
+    for row in totals:
+        entry = ledger.setdefault((row['product_id'], row['reservation_date']), {'reserved': 0, 'completed': 0})
+        entry['completed' if row['status'] == 'completed' else 'reserved'] += row['pieces']
+    DailyCapacity.objects.bulk_create(
+        DailyCapacity(product_id=product_id, date=day, **counts) for (product_id, day), counts in ledger.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0048_atomic_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('reserved', models.PositiveIntegerField(default=0, help_text='Pending, awaiting payment or confirmed')),
+                ('completed', models.PositiveIntegerField(default=0, help_text='Handed over; still counts against the day')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_capacity', to='kakanin.kakanin')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='unique_daily_capacity')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
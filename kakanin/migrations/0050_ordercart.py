@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('kakanin', '0049_dailycapacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCart',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_cart', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderCartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('order_type', models.CharField(default='pickup', max_length=20)),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='kakanin.ordercart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='kakanin.kakanin')),
+            ],
+            options={
+                'ordering': ['id'],
+                'unique_together': {('cart', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+# Under the old flow confirm_payment took an order's items out of stock and
+# moved it to ready_for_pickup / out_for_delivery; admins then moved paid
+# orders on (or back to confirmed) by hand. Orders still in any of these
+# statuses hold their stock, so restore_for_order must give it back.
+DEDUCTED_STATUSES = ('confirmed', 'ready_for_pickup', 'out_for_delivery', 'completed')
+
+
+def mark_deducted_orders(apps, schema_editor):
+    Order = apps.get_model('kakanin', 'Order')
+    Order.objects.filter(status__in=DEDUCTED_STATUSES, stock_deducted=False).update(stock_deducted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kakanin', '0051_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_deducted_orders, migrations.RunPython.noop),
+    ]
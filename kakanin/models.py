@@ -3,6 +3,65 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 
+class FieldTrackerMixin:
+    """
+    Remember the values of ``tracked_fields`` as they were loaded from the
+    database, so signals can ask has_changed('status') / previous('status')
+    without re-reading the row before every save.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _snapshot_tracked_fields(self):
+        # Only fields actually loaded; deferred ones stay unknown
+        self._loaded_values = {
+            name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__
+        }
+
+    def _load_missing_tracked_fields(self):
+        # Instance was not built by from_db (or a field was deferred): read them once
+        loaded = getattr(self, '_loaded_values', {})
+        missing = [name for name in self.tracked_fields if name not in loaded]
+        if missing and self.pk is not None:
+            row = type(self)._base_manager.filter(pk=self.pk).values(*missing).first() or {}
+            loaded.update({name: row.get(name) for name in missing})
+        self._loaded_values = loaded
+
+    def previous(self, field_name):
+        """Value of a tracked field when the instance was loaded (None for new rows)"""
+        if self._state.adding:
+            return None
+        if field_name not in getattr(self, '_loaded_values', {}):
+            self._load_missing_tracked_fields()
+        return self._loaded_values.get(field_name)
+
+    def has_changed(self, field_name):
+        """True if the tracked field differs from its loaded value (always True for new rows)"""
+        if self._state.adding:
+            return True
+        return self.previous(field_name) != getattr(self, field_name)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # New rows have no previous values; post_save must not go looking for them
+            self._loaded_values = dict.fromkeys(self.tracked_fields)
+        else:
+            # Must happen before the UPDATE, or the "previous" value is the new one
+            self._load_missing_tracked_fields()
+        super().save(*args, **kwargs)
+        # post_save handlers have seen the old values; the saved state is now the baseline
+        self._snapshot_tracked_fields()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -80,6 +139,35 @@ class UserProfile(models.Model):
         return address
 
 
+WEEKDAY_BITS = {
+    day: 1 << index
+    for index, day in enumerate(('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'))
+}
+
+
+def weekday_mask(days):
+    """Bitmask of a list of day names (Monday = bit 0); 0 for an empty list, i.e. every day"""
+    mask = 0
+    for day in days or []:
+        mask |= WEEKDAY_BITS.get(day, 0)
+    return mask
+
+
+class KakaninQuerySet(models.QuerySet):
+    def in_category(self, category):
+        """Products tagged with category (indexed KakaninCategory join)"""
+        return self.filter(category_rows__category=category)
+
+    def available_on(self, day):
+        """
+        Products available on a weekday ('saturday'): those with the day's bit set
+        or no day restriction. Written as an IN list over the 7-bit masks so the
+        index on available_days_mask is used.
+        """
+        bit = WEEKDAY_BITS[day]
+        return self.filter(available_days_mask__in=[0] + [mask for mask in range(128) if mask & bit])
+
+
 class Kakanin(models.Model):
     DAYS_OF_WEEK = [
         ('monday', 'Monday'),
@@ -106,6 +194,8 @@ class Kakanin(models.Model):
     # Availability fields
     is_available = models.BooleanField(default=True, help_text="Is this product currently available?")
     available_days = models.JSONField(default=list, blank=True, help_text="Days of the week when available")
+    # Kept in sync with available_days on save; see KakaninQuerySet.available_on
+    available_days_mask = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False)
     available_from_time = models.TimeField(null=True, blank=True, help_text="Available from this time")
     available_to_time = models.TimeField(null=True, blank=True, help_text="Available until this time")
     preparation_time_hours = models.PositiveIntegerField(default=0, help_text="Hours needed to prepare this item")
@@ -123,33 +213,32 @@ class Kakanin(models.Model):
     # Inventory
     stock = models.PositiveIntegerField(default=0, help_text="Available pieces in stock")
     available_today = models.BooleanField(default=False, help_text="Available for order today")
+
+    objects = KakaninQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Stock changes are conditional F() updates (stock.py); never let one go below zero
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='kakanin_stock_non_negative'),
+        ]
     
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.available_days_mask = weekday_mask(self.available_days)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'available_days' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'available_days_mask'}
+        super().save(*args, **kwargs)
     
     def is_in_stock(self):
         return self.stock > 0
     
     def is_available_now(self):
-        """Check if product is available right now"""
-        if not self.is_available:
-            return False
-            
-        from datetime import datetime
-        now = datetime.now()
-        current_day = now.strftime('%A').lower()
-        current_time = now.time()
-        
-        # Check day availability
-        if self.available_days and current_day not in self.available_days:
-            return False
-            
-        # Check time availability
-        if self.available_from_time and self.available_to_time:
-            if not (self.available_from_time <= current_time <= self.available_to_time):
-                return False
-                
-        return True
+        """Check if product is available right now (in the shop's timezone)"""
+        from .availability import Schedule, local_now
+        return Schedule(self).is_available_at(local_now())
     
     def get_availability_display(self):
         """Get human-readable availability info"""
@@ -192,6 +281,26 @@ class Kakanin(models.Model):
         return self.allow_reservation
 
 
+class KakaninCategory(models.Model):
+    """
+    One row per entry of Kakanin.categories, kept in sync by signals.py, so
+    category filters are an indexed join instead of a scan of the JSON lists
+    """
+    product = models.ForeignKey(Kakanin, on_delete=models.CASCADE, related_name='category_rows')
+    category = models.CharField(max_length=20, choices=Kakanin.CATEGORY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'category'], name='unique_kakanin_category'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'product'], name='kakanincategory_category'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.category}"
+
+
 class AboutPage(models.Model):
     title = models.CharField(max_length=150, default="About Nanay")
     body = models.TextField()
@@ -204,6 +313,25 @@ class AboutPage(models.Model):
         return self.title
 
 
+class CarouselImage(models.Model):
+    """Admin-chosen image for the user dashboard carousel; replaces the bundled ones while any is active"""
+    image = models.ImageField(upload_to='carousel/')
+    alt = models.CharField(max_length=150, blank=True, default="Kakanin image")
+    sort_order = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    # Filled in from the upload on save (carousel.describe)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    color = models.CharField(max_length=7, blank=True, editable=False, help_text="Dominant color, shown while loading")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+
+    def __str__(self):
+        return self.alt or self.image.name
+
+
 class ContactInfo(models.Model):
     address = models.CharField(max_length=255)
     phone = models.CharField(max_length=30)
@@ -250,10 +378,54 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at'], name='notification_user_read'),
+            # Partial indexes (SQLite/PostgreSQL) stay small as read rows pile up
+            models.Index(fields=['user', '-created_at'], condition=models.Q(read=False), name='notification_user_unread'),
+            models.Index(fields=['-created_at'], condition=models.Q(user__isnull=True), name='notification_admin'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
+    # Admin notifications (user=None) are broadcast to every staff member.
+    # Each staff member's read state lives in NotificationReceipt; a missing
+    # receipt means unread. The shared ``read`` flag only marks legacy rows
+    # that were read before receipts existed.
+
+    @classmethod
+    def admin_unread_for(cls, user):
+        """Admin notifications this staff member has not read yet"""
+        receipts = NotificationReceipt.objects.filter(notification=models.OuterRef('pk'), user=user)
+        return cls.objects.filter(user__isnull=True, read=False).exclude(models.Exists(receipts))
+
+    @classmethod
+    def admin_for(cls, user):
+        """All admin notifications, annotated with ``seen`` for this staff member"""
+        receipts = NotificationReceipt.objects.filter(notification=models.OuterRef('pk'), user=user)
+        return cls.objects.filter(user__isnull=True).annotate(
+            seen=models.Case(
+                models.When(models.Q(read=True) | models.Q(models.Exists(receipts)), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            )
+        )
+
+
+class NotificationReceipt(models.Model):
+    """Read receipt for a broadcast (admin) notification, one row per staff member who read it"""
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='unique_notification_receipt'),
+        ]
+
+    def __str__(self):
+        return f"Notification #{self.notification_id} read by {self.user_id}"
+
 
 class Message(models.Model):
     sender = models.ForeignKey(
@@ -280,13 +452,187 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read'], name='message_recipient_read'),
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False), name='message_recipient_unread'),
+            models.Index(fields=['sender', 'recipient', '-created_at'], name='message_thread'),
+        ]
 
     def __str__(self):
         sender_label = self.sender.username if self.sender else (self.guest_name or 'Guest')
         return f"From {sender_label} to {self.recipient.username}: {self.subject or self.body[:30]}"
 
 
-class Order(models.Model):
+class Job(models.Model):
+    """Queued background job, run by ``manage.py run_worker`` (see jobs.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=200, help_text="Dotted path of the task function")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not run before this time (retry backoff)")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts})"
+
+
+class LiveEvent(models.Model):
+    """Event waiting to be streamed by the database live-events backend (see events.py)"""
+    channel = models.CharField(max_length=64)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'id'], name='liveevent_channel_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel}: {self.data.get('type')} #{self.id}"
+
+
+class ImageDerivative(models.Model):
+    """Resized WebP/JPEG copies of one uploaded image (see images.py)"""
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the original upload")
+    variants = models.JSONField(default=list, help_text="[{size, width, height, format, name, url}, ...]")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.source} ({len(self.variants)} variants)"
+
+
+class IdempotencyKey(models.Model):
+    """A form submission token and the response it produced (see idempotency.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    scope = models.CharField(max_length=64, help_text="View the token was submitted to")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while the first submission is running")
+    location = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencykey_user_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} -> {self.status_code or 'pending'}"
+
+
+class Conversation(models.Model):
+    """
+    One row per two-person message thread, kept up to date from Message
+    signals so inbox and navbar lists never have to scan Message.
+    Participants are stored with the lower user id first.
+    """
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity = models.DateTimeField(default=timezone.now)
+    unread_low = models.PositiveIntegerField(default=0, help_text="Unread messages addressed to user_low")
+    unread_high = models.PositiveIntegerField(default=0, help_text="Unread messages addressed to user_high")
+
+    class Meta:
+        ordering = ['-last_activity']
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='unique_conversation_participants'),
+        ]
+        indexes = [
+            models.Index(fields=['user_low', '-last_activity'], name='conversation_low_activity'),
+            models.Index(fields=['user_high', '-last_activity'], name='conversation_high_activity'),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.user_low_id} <-> {self.user_high_id}"
+
+    @staticmethod
+    def participants(user_a_id, user_b_id):
+        """Return the (low, high) id pair for two users"""
+        return (user_a_id, user_b_id) if user_a_id <= user_b_id else (user_b_id, user_a_id)
+
+    @classmethod
+    def for_user(cls, user):
+        """Threads the user takes part in, newest activity first"""
+        return cls.objects.filter(
+            models.Q(user_low=user) | models.Q(user_high=user)
+        ).select_related(
+            'user_low__userprofile', 'user_high__userprofile', 'last_message'
+        ).order_by('-last_activity')
+
+    @classmethod
+    def between(cls, user_a, user_b):
+        """The thread between two users, or None if they never exchanged messages"""
+        low, high = cls.participants(user_a.id, user_b.id)
+        return cls.objects.select_related('last_message').filter(user_low_id=low, user_high_id=high).first()
+
+    @classmethod
+    def record_message(cls, message):
+        """Move a thread forward for a newly created message"""
+        low, high = cls.participants(message.sender_id, message.recipient_id)
+        conversation, _ = cls.objects.get_or_create(user_low_id=low, user_high_id=high)
+        changes = {'last_message': message, 'last_activity': message.created_at}
+        if not message.is_read:
+            field = 'unread_low' if message.recipient_id == low else 'unread_high'
+            changes[field] = models.F(field) + 1
+        cls.objects.filter(pk=conversation.pk).update(**changes)
+
+    @classmethod
+    def refresh(cls, user_a_id, user_b_id):
+        """Recompute a thread from its messages after an edit, unsend, read or delete"""
+        low, high = cls.participants(user_a_id, user_b_id)
+        thread = Message.objects.filter(
+            models.Q(sender_id=low, recipient_id=high) | models.Q(sender_id=high, recipient_id=low)
+        )
+        last_message = thread.order_by('-created_at').first()
+        if last_message is None:
+            cls.objects.filter(user_low_id=low, user_high_id=high).delete()
+            return
+        unread = thread.filter(is_read=False).aggregate(
+            low=models.Count('id', filter=models.Q(recipient_id=low)),
+            high=models.Count('id', filter=models.Q(recipient_id=high)),
+        )
+        cls.objects.update_or_create(
+            user_low_id=low, user_high_id=high,
+            defaults={
+                'last_message': last_message,
+                'last_activity': last_message.created_at,
+                'unread_low': unread['low'],
+                'unread_high': unread['high'],
+            },
+        )
+
+    @classmethod
+    def mark_read(cls, reader, other):
+        """Clear the reader's unread counter for the thread with other"""
+        low, high = cls.participants(reader.id, other.id)
+        field = 'unread_low' if reader.id == low else 'unread_high'
+        cls.objects.filter(user_low_id=low, user_high_id=high).update(**{field: 0})
+
+    def other_user(self, user):
+        return self.user_high if user.id == self.user_low_id else self.user_low
+
+    def unread_for(self, user):
+        return self.unread_low if user.id == self.user_low_id else self.unread_high
+
+
+class Order(FieldTrackerMixin, models.Model):
+    tracked_fields = ('status',)
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('pending_confirmation', 'Pending Confirmation'),
@@ -326,6 +672,9 @@ class Order(models.Model):
     
     # Delivery options
     delivery = models.BooleanField(default=False, help_text="True for delivery, False for pickup")
+
+    # Set while the items are taken out of stock (stock.deduct_for_order / restore_for_order)
+    stock_deducted = models.BooleanField(default=False, editable=False)
     
     # Notes
     notes = models.TextField(blank=True, help_text="Customer notes or special requests")
@@ -336,9 +685,22 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username} - ₱{self.total_amount}"
+
+    def save(self, *args, **kwargs):
+        # stock_deducted is only written by stock.py's conditional updates; an
+        # instance loaded before a concurrent confirm must not write it back
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'stock_deducted'
+            ]
+        super().save(*args, **kwargs)
     
     def get_items_total(self):
         """Calculate total from order items"""
@@ -415,8 +777,10 @@ class Feedback(models.Model):
         return f"Feedback by {who}: {self.body[:30]}"
 
 
-class Reservation(models.Model):
+class Reservation(FieldTrackerMixin, models.Model):
     """Reservation model for advance kakanin orders"""
+    tracked_fields = ('status',)
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('pending_payment', 'Pending Payment'),
@@ -448,6 +812,9 @@ class Reservation(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['reservation_date', 'status'], name='reservation_date_status'),
+        ]
     
     def __str__(self):
         return f"Reservation #{self.id} - {self.user.username} - {self.product.name} on {self.reservation_date}"
@@ -457,6 +824,107 @@ class Reservation(models.Model):
         return self.total_amount - self.downpayment_amount
 
 
+class DailyCapacity(models.Model):
+    """
+    Pieces of a product committed to reservations for one pickup date, kept
+    by capacity.py and checked against Kakanin.max_daily_quantity
+    """
+    product = models.ForeignKey(Kakanin, on_delete=models.CASCADE, related_name='daily_capacity')
+    date = models.DateField()
+    reserved = models.PositiveIntegerField(default=0, help_text="Pending, awaiting payment or confirmed")
+    completed = models.PositiveIntegerField(default=0, help_text="Handed over; still counts against the day")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_daily_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.reserved} reserved, {self.completed} completed"
+
+    @property
+    def used(self):
+        return self.reserved + self.completed
+
+
+class OrderCart(models.Model):
+    """
+    Server-side shopping cart for order-now products
+    Keyed by the user, so item rows need no join to find their owner. Holds
+    only (product, quantity, order_type); names, prices and stock are always
+    read from the product.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Order Cart - {self.user.username}"
+    
+    @classmethod
+    def for_request(cls, request):
+        """The logged-in user's cart, taking over a legacy session cart the first time"""
+        cart, _ = cls.objects.get_or_create(user=request.user)
+        session_cart = request.session.pop('cart', None)
+        if session_cart:
+            cart.absorb(session_cart)
+        return cart
+    
+    def absorb(self, session_cart):
+        """Merge an old {product_id: {'quantity', 'order_type', ...}} session cart into this one"""
+        product_ids = set(Kakanin.objects.filter(
+            id__in=[int(product_id) for product_id in session_cart],
+        ).values_list('id', flat=True))
+        existing = {item.product_id: item for item in self.items.all()}
+        for product_id, entry in session_cart.items():
+            product_id = int(product_id)
+            if product_id not in product_ids:
+                continue
+            item = existing.get(product_id)
+            if item:
+                item.quantity += entry['quantity']
+                item.save(update_fields=['quantity'])
+            else:
+                OrderCartItem.objects.create(
+                    cart=self,
+                    product_id=product_id,
+                    quantity=entry['quantity'],
+                    order_type=entry.get('order_type', 'pickup'),
+                )
+    
+    def _items(self, items):
+        return self.items.select_related('product') if items is None else items
+    
+    def get_total(self, items=None):
+        """Calculate total amount for all items in cart"""
+        from .pricing import quote_order, snapshot
+        return quote_order(snapshot(self._items(items))).subtotal
+    
+    def get_item_count(self, items=None):
+        """Get total number of items in cart"""
+        return sum(item.quantity for item in self._items(items))
+
+
+class OrderCartItem(models.Model):
+    """Individual items in order cart"""
+    cart = models.ForeignKey(OrderCart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Kakanin, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    order_type = models.CharField(max_length=20, default='pickup')
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['cart', 'product']
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity}"
+    
+    def get_subtotal(self):
+        """Calculate subtotal for this item"""
+        return self.product.price * self.quantity
+
+
 class ReservationCart(models.Model):
     """Shopping cart for reservations"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='reservation_cart')
@@ -466,23 +934,26 @@ class ReservationCart(models.Model):
     def __str__(self):
         return f"Reservation Cart - {self.user.username}"
     
-    def get_total(self):
+    def _items(self, items):
+        return self.items.select_related('product') if items is None else items
+    
+    def get_totals(self, items=None):
+        """(total, downpayment) from one quote; pass already-loaded items to skip the query"""
+        from .pricing import quote_reservation, snapshot
+        quote = quote_reservation(snapshot(self._items(items)))
+        return quote.subtotal, quote.downpayment
+    
+    def get_total(self, items=None):
         """Calculate total amount for all items in cart"""
-        return sum(item.get_subtotal() for item in self.items.all())
-    
-    def get_downpayment(self):
-        """Calculate downpayment based on each product's reservation_downpayment_percent"""
-        from decimal import Decimal
-        downpayment = Decimal('0')
-        for item in self.items.all():
-            item_subtotal = item.get_subtotal()
-            downpayment_percent = item.product.reservation_downpayment_percent / Decimal('100')
-            downpayment += item_subtotal * downpayment_percent
-        return downpayment
-    
-    def get_item_count(self):
+        return self.get_totals(items)[0]
+    
+    def get_downpayment(self, items=None):
+        """Downpayment from each product's reservation_downpayment_percent (pricing.py)"""
+        return self.get_totals(items)[1]
+    
+    def get_item_count(self, items=None):
         """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        return sum(item.quantity for item in self._items(items))
 
 
 class ReservationCartItem(models.Model):
@@ -1,13 +1,20 @@
 """
 Utility functions for notification management
 """
-from .models import Notification
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import counters
+from .models import Notification, NotificationReceipt
 
 
 def create_admin_notification(notification_type, message, order=None, reservation=None):
     """
     Create a notification for admin users
-    Admin notifications have user=None
+    Admin notifications have user=None and are broadcast to every staff
+    member; read state is tracked per staff member with NotificationReceipt
     """
     return Notification.objects.create(
         type=notification_type,
@@ -38,29 +45,43 @@ def mark_notification_as_read(notification_id, user):
     """
     try:
         if user.is_staff:
-            # Admin can mark admin notifications (user=None) as read
+            # Admin notifications (user=None) are read per staff member
             notification = Notification.objects.get(id=notification_id, user__isnull=True)
+            mark_admin_notification_as_read(notification, user)
         else:
             # Regular user can only mark their own notifications as read
             notification = Notification.objects.get(id=notification_id, user=user)
-        
-        notification.read = True
-        notification.save()
+            notification.read = True
+            notification.save()
         return True
     except Notification.DoesNotExist:
         return False
 
 
+def mark_admin_notification_as_read(notification, user):
+    """
+    Record that one staff member read an admin notification
+    Other staff members still see it as unread
+    """
+    NotificationReceipt.objects.get_or_create(notification=notification, user=user)
+
+
 def mark_all_notifications_as_read(user):
     """
     Mark all notifications as read for a user
     """
     if user.is_staff:
-        # Mark all admin notifications as read
-        Notification.objects.filter(user__isnull=True, read=False).update(read=True)
+        # Mark all admin notifications as read for this staff member only
+        unread_ids = Notification.admin_unread_for(user).values_list('id', flat=True)
+        NotificationReceipt.objects.bulk_create(
+            [NotificationReceipt(notification_id=pk, user=user) for pk in unread_ids],
+            ignore_conflicts=True,
+        )
+        counters.invalidate(user.id, counters.ADMIN_NOTIFICATIONS)
     else:
         # Mark all user's notifications as read
         Notification.objects.filter(user=user, read=False).update(read=True)
+        counters.invalidate(user.id, counters.NOTIFICATIONS)
     
     return True
 
@@ -82,14 +103,15 @@ def get_user_notifications(user, unread_only=False, limit=None):
     return queryset
 
 
-def get_admin_notifications(unread_only=False, limit=None):
+def get_admin_notifications(user, unread_only=False, limit=None):
     """
-    Get admin notifications (user=None)
+    Get admin notifications (user=None) as seen by one staff member
+    Each notification is annotated with ``seen`` for that staff member
     """
-    queryset = Notification.objects.filter(user__isnull=True)
-    
     if unread_only:
-        queryset = queryset.filter(read=False)
+        queryset = Notification.admin_unread_for(user)
+    else:
+        queryset = Notification.admin_for(user)
     
     queryset = queryset.order_by('-created_at')
     
@@ -99,18 +121,64 @@ def get_admin_notifications(unread_only=False, limit=None):
     return queryset
 
 
+# Notification feeds are paged by keyset on (created_at, id) rather than
+# OFFSET, so a page costs the same however far back the user scrolls and
+# new notifications arriving meanwhile don't shift the pages.
+
+FEED_PAGE_SIZE = 20
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(notification):
+    """Opaque cursor pointing at a notification: "<created_at in microseconds>.<id>" """
+    micros = (notification.created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{notification.id}"
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or malformed"""
+    try:
+        micros, pk = cursor.split('.')
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_notification_page(queryset, before=None, since=None, limit=FEED_PAGE_SIZE):
+    """
+    One page of a notification queryset, newest first
+    ``before`` returns notifications older than that cursor (the next page);
+    ``since`` returns notifications newer than it (the delta since the last
+    fetch). Returns (notifications, has_more).
+    """
+    if since:
+        position = decode_cursor(since)
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+        # Oldest unseen first, so a capped delta never leaves a gap
+        page = list(queryset.order_by('created_at', 'id')[:limit + 1])
+        return page[:limit][::-1], len(page) > limit
+
+    position = decode_cursor(before) if before else None
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    page = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+    return page[:limit], len(page) > limit
+
+
 def delete_old_notifications(days=30):
     """
     Delete read notifications older than specified days
-    Helps keep the database clean
+    Helps keep the database clean; deletes in batches (see retention.py)
     """
-    from django.utils import timezone
-    from datetime import timedelta
+    from .retention import delete_in_batches
     
     cutoff_date = timezone.now() - timedelta(days=days)
-    deleted_count = Notification.objects.filter(
-        read=True,
-        created_at__lt=cutoff_date
-    ).delete()[0]
+    deleted_count, _ = delete_in_batches(
+        Notification.objects.filter(read=True, created_at__lt=cutoff_date)
+    )
     
     return deleted_count
@@ -0,0 +1,150 @@
+"""
+Prices, shipping fees and downpayments for carts, checkout and reservations
+
+Every amount a customer is shown or charged comes from a Quote:
+
+    quote = pricing.quote_order(pricing.snapshot(cart_items), delivery=True)
+    quote.subtotal, quote.shipping_fee, quote.downpayment, quote.grand_total
+    for item, line in zip(cart_items, quote.lines): line.subtotal, line.downpayment
+
+A snapshot holds only plain values (product id, quantity, price and the
+product's pricing settings), so quoting needs no queries of its own and the
+checkout preview and the POST that follows it price the same snapshot the
+same way. quote_many() prices many carts with a single product query, for
+reports.
+
+Rules
+- Order shipping: SHIPPING_FEE for delivery, waived once the cart holds
+  FREE_SHIPPING_EXTRA pieces more than the largest delivery_min_quantity of
+  its products (the same threshold the shop's product modal shows)
+- Order downpayment (delivery only): each line's preorder_downpayment_percent,
+  with the shipping fee charged at the cart's overall rate
+- Reservation downpayment: each line's reservation_downpayment_percent
+Amounts are rounded to the centavo.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+
+from .models import Kakanin
+
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+ZERO = Decimal('0.00')
+SHIPPING_FEE = Decimal(str(getattr(settings, 'DELIVERY_SHIPPING_FEE', '50.00')))
+FREE_SHIPPING_EXTRA = getattr(settings, 'DELIVERY_FREE_SHIPPING_EXTRA', 10)
+
+
+def _decimal(value):
+    # Views assign floats to the percent fields before saving
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def snapshot(items):
+    """
+    Snapshot of cart items (anything with .product and .quantity)
+    or of (product, quantity) pairs, in order
+    """
+    entries = []
+    for item in items:
+        product, quantity = (item.product, item.quantity) if hasattr(item, 'product') else item
+        entries.append((
+            product.id,
+            quantity,
+            _decimal(product.price),
+            _decimal(product.preorder_downpayment_percent),
+            _decimal(product.reservation_downpayment_percent),
+            product.delivery_min_quantity,
+        ))
+    return tuple(entries)
+
+
+class Line:
+    """One priced cart line, in snapshot order"""
+
+    __slots__ = ('product_id', 'quantity', 'unit_price', 'subtotal', 'downpayment')
+
+    def __init__(self, product_id, quantity, unit_price, subtotal, downpayment):
+        self.product_id = product_id
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.subtotal = subtotal
+        self.downpayment = downpayment
+
+
+class Quote:
+    """Totals for one cart"""
+
+    __slots__ = ('lines', 'total_quantity', 'subtotal', 'shipping_fee', 'downpayment', 'grand_total')
+
+    def __init__(self, lines, subtotal, shipping_fee, downpayment):
+        self.lines = tuple(lines)
+        self.total_quantity = sum(line.quantity for line in self.lines)
+        self.subtotal = subtotal
+        self.shipping_fee = shipping_fee
+        self.downpayment = downpayment
+        self.grand_total = subtotal + shipping_fee
+
+    @property
+    def balance(self):
+        return self.grand_total - self.downpayment
+
+    @property
+    def downpayment_percent(self):
+        """Downpayment as a share of the grand total, for labels"""
+        if not self.grand_total:
+            return ZERO
+        return (self.downpayment * HUNDRED / self.grand_total).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+def quote_order(snapshot, delivery=False):
+    """Quote for an order cart snapshot, picked up or delivered"""
+    lines = []
+    goods_downpayment = Decimal('0')
+    for product_id, quantity, price, preorder_percent, _, _ in snapshot:
+        subtotal = price * quantity
+        downpayment = subtotal * preorder_percent / HUNDRED if delivery else Decimal('0')
+        goods_downpayment += downpayment
+        lines.append(Line(product_id, quantity, price, subtotal, _money(downpayment)))
+    subtotal = sum((line.subtotal for line in lines), ZERO)
+
+    shipping_fee = ZERO
+    downpayment = ZERO
+    if delivery and lines:
+        # delivery_min_quantity is the minimum for delivery, not for free shipping
+        free_from = max(entry[5] for entry in snapshot) + FREE_SHIPPING_EXTRA
+        if sum(line.quantity for line in lines) < free_from:
+            shipping_fee = SHIPPING_FEE
+        rate = goods_downpayment / subtotal if subtotal else Decimal('0')
+        downpayment = _money(goods_downpayment + shipping_fee * rate)
+    return Quote(lines, subtotal, shipping_fee, downpayment)
+
+
+def quote_reservation(snapshot):
+    """Quote for a reservation cart snapshot; each line becomes one Reservation"""
+    lines = []
+    for product_id, quantity, price, _, reservation_percent, _ in snapshot:
+        subtotal = price * quantity
+        lines.append(Line(product_id, quantity, price, subtotal, _money(subtotal * reservation_percent / HUNDRED)))
+    return Quote(
+        lines,
+        sum((line.subtotal for line in lines), ZERO),
+        ZERO,
+        sum((line.downpayment for line in lines), ZERO),
+    )
+
+
+def quote_many(carts, reservation=False, delivery=False):
+    """{key: Quote} for {key: [(product_id, quantity), ...]}, with one product query for all carts"""
+    product_ids = {product_id for lines in carts.values() for product_id, _ in lines}
+    products = Kakanin.objects.in_bulk(product_ids)
+    quotes = {}
+    for key, lines in carts.items():
+        cart_snapshot = snapshot((products[product_id], quantity) for product_id, quantity in lines if product_id in products)
+        quotes[key] = quote_reservation(cart_snapshot) if reservation else quote_order(cart_snapshot, delivery)
+    return quotes
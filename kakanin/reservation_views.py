@@ -9,8 +9,10 @@ from django.db import transaction
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
-from decimal import Decimal
+from django.http import JsonResponse
 from datetime import date, time, datetime, timedelta
+from . import capacity, carts, pricing, tasks
+from .idempotency import idempotent, mark_submitted
 from .models import Kakanin, Reservation, Notification, ContactInfo, ReservationCart, ReservationCartItem
 
 
@@ -26,14 +28,32 @@ def reservation_shop(request):
     return redirect(url)
 
 
+def _capacity_message(product, day, remaining):
+    if not remaining or remaining <= 0:
+        return f'{product.name} is fully booked on {day.strftime("%B %d, %Y")}. Please choose another date.'
+    piece_text = "piece" if remaining == 1 else "pieces"
+    return f'Only {remaining} {piece_text} of {product.name} left on {day.strftime("%B %d, %Y")}.'
+
+
+@login_required
+def reservation_capacity(request, product_id):
+    """Remaining pieces per day for the next 30 days, for the reservation date picker"""
+    product = get_object_or_404(Kakanin, id=product_id)
+    start = date.today() + timedelta(days=product.preparation_days if product.preparation_days else 3)
+    days = capacity.remaining_by_day(product, start, days=30)
+    return JsonResponse({
+        'max_daily_quantity': product.max_daily_quantity,
+        'days': {day.isoformat(): remaining for day, remaining in days.items()},
+    })
+
+
 @login_required
 def add_to_reservation_cart(request, product_id):
     """Add product to reservation cart"""
     product = get_object_or_404(Kakanin, id=product_id)
     
     if not product.is_reservable():
-        messages.error(request, 'This product is not available for reservation.')
-        return redirect('reservation_shop')
+        return carts.reply(request, False, 'This product is not available for reservation.', 'reservation_shop', cart=carts.RESERVATION)
     
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
@@ -43,19 +63,16 @@ def add_to_reservation_cart(request, product_id):
         
         # Validation
         if quantity <= 0:
-            messages.error(request, 'Quantity must be at least 1.')
-            return redirect('reservation_shop')
+            return carts.reply(request, False, 'Quantity must be at least 1.', 'reservation_shop', cart=carts.RESERVATION)
         
         # Validate minimum order quantity
         min_quantity = product.min_order_quantity if product.min_order_quantity else 1
         if quantity < min_quantity:
             piece_text = "piece" if min_quantity == 1 else "pieces"
-            messages.error(request, f'Minimum order quantity for {product.name} is {min_quantity} {piece_text}.')
-            return redirect('reservation_shop')
+            return carts.reply(request, False, f'Minimum order quantity for {product.name} is {min_quantity} {piece_text}.', 'reservation_shop', cart=carts.RESERVATION)
         
         if not reservation_date or not reservation_time:
-            messages.error(request, 'Reservation date and time are required.')
-            return redirect('reservation_shop')
+            return carts.reply(request, False, 'Reservation date and time are required.', 'reservation_shop', cart=carts.RESERVATION)
         
         # Validate reservation date (use product's preparation_days)
         reservation_datetime = datetime.strptime(f"{reservation_date} {reservation_time}", "%Y-%m-%d %H:%M")
@@ -64,12 +81,20 @@ def add_to_reservation_cart(request, product_id):
         
         if reservation_datetime.date() < min_reservation_date:
             day_text = "day" if preparation_days == 1 else "days"
-            messages.error(request, f'Please reserve at least {preparation_days} {day_text} in advance. Earliest date: {min_reservation_date.strftime("%B %d, %Y")}')
-            return redirect('reservation_shop')
+            return carts.reply(request, False, f'Please reserve at least {preparation_days} {day_text} in advance. Earliest date: {min_reservation_date.strftime("%B %d, %Y")}', 'reservation_shop', cart=carts.RESERVATION)
         
         # Get or create cart
         cart, created = ReservationCart.objects.get_or_create(user=request.user)
         
+        # Daily production limit (held for real when the reservation is submitted)
+        remaining = capacity.remaining(product, reservation_datetime.date())
+        if remaining is not None:
+            in_cart = sum(cart.items.filter(
+                product=product, reservation_date=reservation_datetime.date(),
+            ).values_list('quantity', flat=True))
+            if in_cart + quantity > remaining:
+                return carts.reply(request, False, _capacity_message(product, reservation_datetime.date(), remaining - in_cart), 'reservation_shop', cart=carts.RESERVATION)
+        
         # Check if item already exists in cart
         cart_item, created = ReservationCartItem.objects.get_or_create(
             cart=cart,
@@ -84,13 +109,13 @@ def add_to_reservation_cart(request, product_id):
             cart_item.quantity += quantity
             cart_item.notes = notes
             cart_item.save()
-            messages.success(request, f'Updated {product.name} quantity in cart!')
+            message = f'Updated {product.name} quantity in cart!'
         else:
-            messages.success(request, f'✅ {product.name} added to reservation cart!')
+            message = f'✅ {product.name} added to reservation cart!'
         
         from django.urls import reverse
         url = reverse('view_cart') + '?tab=reservation'
-        return redirect(url)
+        return carts.reply(request, True, message, url, cart=carts.RESERVATION, line=carts.reservation_line(cart_item))
     
     return redirect('reservation_shop')
 
@@ -104,32 +129,33 @@ def reservation_cart(request):
 @login_required
 def remove_from_reservation_cart(request, item_id):
     """Remove item from reservation cart"""
-    cart_item = get_object_or_404(ReservationCartItem, id=item_id, cart__user=request.user)
+    cart_item = get_object_or_404(ReservationCartItem.objects.select_related('product'), id=item_id, cart__user=request.user)
     product_name = cart_item.product.name
+    line = carts.reservation_line(cart_item, removed=True)
     cart_item.delete()
-    messages.success(request, f'{product_name} removed from cart.')
-    return redirect('view_cart')
+    return carts.reply(request, True, f'{product_name} removed from cart.', 'view_cart', cart=carts.RESERVATION, line=line)
 
 
 @login_required
 def update_reservation_cart(request, item_id):
     """Update cart item quantity"""
     if request.method == 'POST':
-        cart_item = get_object_or_404(ReservationCartItem, id=item_id, cart__user=request.user)
+        cart_item = get_object_or_404(ReservationCartItem.objects.select_related('product'), id=item_id, cart__user=request.user)
         quantity = int(request.POST.get('quantity', 1))
         
         if quantity > 0:
             cart_item.quantity = quantity
             cart_item.save()
-            messages.success(request, 'Cart updated.')
-        else:
-            cart_item.delete()
-            messages.success(request, 'Item removed from cart.')
+            return carts.reply(request, True, 'Cart updated.', 'view_cart', cart=carts.RESERVATION, line=carts.reservation_line(cart_item))
+        line = carts.reservation_line(cart_item, removed=True)
+        cart_item.delete()
+        return carts.reply(request, True, 'Item removed from cart.', 'view_cart', cart=carts.RESERVATION, line=line)
     
     return redirect('view_cart')
 
 
 @login_required
+@idempotent('reservation_list')
 def submit_reservation(request):
     """Submit reservation for admin confirmation (no payment yet)"""
     if request.method != 'POST':
@@ -142,7 +168,7 @@ def submit_reservation(request):
         messages.error(request, 'Please select at least one item to reserve.')
         return redirect('view_cart')
     
-    cart = get_object_or_404(ReservationCart, user=request.user)
+    cart, _ = ReservationCart.objects.get_or_create(user=request.user)
     
     # Filter cart items to only include selected ones
     cart_items = cart.items.select_related('product').filter(id__in=selected_item_ids)
@@ -151,20 +177,25 @@ def submit_reservation(request):
         messages.error(request, 'Selected items not found in your cart.')
         return redirect('view_cart')
     
+    quote = pricing.quote_reservation(pricing.snapshot(cart_items))
+    
     try:
         with transaction.atomic():
             # Create reservation for each selected cart item with "pending" status
-            for item in cart_items:
-                total_amount = item.get_subtotal()
-                downpayment_percent = item.product.reservation_downpayment_percent / Decimal('100')
-                downpayment_amount = total_amount * downpayment_percent
+            for item, line in zip(cart_items, quote.lines):
+                # Hold the day's capacity; roll every reservation back if one day is full
+                if not capacity.reserve(item.product, item.reservation_date, item.quantity):
+                    remaining = capacity.remaining(item.product, item.reservation_date)
+                    transaction.set_rollback(True)
+                    messages.error(request, _capacity_message(item.product, item.reservation_date, remaining))
+                    return redirect('view_cart')
                 
                 reservation = Reservation.objects.create(
                     user=request.user,
                     product=item.product,
                     quantity=item.quantity,
-                    total_amount=total_amount,
-                    downpayment_amount=downpayment_amount,
+                    total_amount=line.subtotal,
+                    downpayment_amount=line.downpayment,
                     reservation_date=item.reservation_date,
                     reservation_time=item.reservation_time,
                     delivery=False,  # Will be set during payment
@@ -178,6 +209,7 @@ def submit_reservation(request):
             cart_items.delete()
             
             messages.success(request, f'✅ {cart_items.count()} reservation(s) submitted successfully! Please wait for Nanay to confirm your reservation before proceeding to payment.')
+            mark_submitted(request)
             return redirect('reservation_list')
     
     except Exception as e:
@@ -215,10 +247,11 @@ def reservation_payment(request, reservation_id):
         try:
             # Update reservation with payment info
             reservation.gcash_reference = gcash_reference
-            reservation.payment_proof = payment_proof
             reservation.delivery = delivery
             reservation.status = 'confirmed'  # Change to confirmed after payment submission
             reservation.save()
+            # Uploaded to Cloudinary by the worker, not inside the request
+            tasks.store_upload_later([reservation], 'payment_proof', payment_proof)
             # Notification automatically created by signal when status changes
             
             messages.success(request, f'✅ Payment submitted successfully for Reservation #{reservation.id}! Your reservation is now confirmed.')
@@ -240,15 +273,19 @@ def reservation_payment(request, reservation_id):
 
 
 @login_required
+@idempotent('reservation_list')
 def reservation_checkout(request):
     """Checkout reservation cart"""
-    cart = get_object_or_404(ReservationCart, user=request.user)
+    cart, _ = ReservationCart.objects.get_or_create(user=request.user)
     cart_items = cart.items.select_related('product').all()
     
     if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('reservation_shop')
     
+    # Shown on the page and charged on submit alike
+    quote = pricing.quote_reservation(pricing.snapshot(cart_items))
+    
     if request.method == 'POST':
         gcash_reference = request.POST.get('gcash_reference', '').strip()
         payment_proof = request.FILES.get('payment_proof')
@@ -269,32 +306,40 @@ def reservation_checkout(request):
         try:
             with transaction.atomic():
                 # Create reservation for each cart item
-                for item in cart_items:
-                    total_amount = item.get_subtotal()
-                    downpayment_percent = item.product.reservation_downpayment_percent / Decimal('100')
-                    downpayment_amount = total_amount * downpayment_percent
+                reservations = []
+                for item, line in zip(cart_items, quote.lines):
+                    # Hold the day's capacity; roll every reservation back if one day is full
+                    if not capacity.reserve(item.product, item.reservation_date, item.quantity):
+                        remaining = capacity.remaining(item.product, item.reservation_date)
+                        transaction.set_rollback(True)
+                        messages.error(request, _capacity_message(item.product, item.reservation_date, remaining))
+                        return redirect('reservation_checkout')
                     
                     reservation = Reservation.objects.create(
                         user=request.user,
                         product=item.product,
                         quantity=item.quantity,
-                        total_amount=total_amount,
-                        downpayment_amount=downpayment_amount,
+                        total_amount=line.subtotal,
+                        downpayment_amount=line.downpayment,
                         reservation_date=item.reservation_date,
                         reservation_time=item.reservation_time,
                         delivery=delivery,
                         status='pending_payment',
                         payment_method='gcash',
                         gcash_reference=gcash_reference,
-                        payment_proof=payment_proof,
                         notes=item.notes
                     )
+                    reservations.append(reservation)
                     # Notification automatically created by signal
                 
+                # One upload shared by every reservation, done by the worker
+                tasks.store_upload_later(reservations, 'payment_proof', payment_proof)
+                
                 # Clear cart
                 cart.items.all().delete()
                 
                 messages.success(request, f'✅ {cart_items.count()} reservation(s) submitted successfully! Please wait for admin confirmation.')
+                mark_submitted(request)
                 return redirect('reservation_list')
         
         except Exception as e:
@@ -308,14 +353,16 @@ def reservation_checkout(request):
     context = {
         'cart': cart,
         'cart_items': cart_items,
-        'total': cart.get_total(),
-        'downpayment': cart.get_downpayment(),
+        'total': quote.subtotal,
+        'downpayment': quote.downpayment,
+        'downpayment_percent': quote.downpayment_percent,
         'gcash_number': gcash_number,
     }
     return render(request, 'kakanin/reservation_checkout.html', context)
 
 
 @login_required
+@idempotent('reservation_list')
 def reservation_create(request, product_id):
     """Create a new reservation"""
     product = get_object_or_404(Kakanin, id=product_id)
@@ -373,28 +420,34 @@ def reservation_create(request, product_id):
                 return redirect('reservation_create', product_id=product_id)
         
         # Calculate amounts
-        total_amount = product.price * quantity
-        downpayment_percent = product.reservation_downpayment_percent / Decimal('100')
-        downpayment_amount = total_amount * downpayment_percent
+        line = pricing.quote_reservation(pricing.snapshot([(product, quantity)])).lines[0]
         
-        # Create reservation
-        reservation = Reservation.objects.create(
-            user=request.user,
-            product=product,
-            quantity=quantity,
-            total_amount=total_amount,
-            downpayment_amount=downpayment_amount,
-            reservation_date=reservation_date,
-            reservation_time=reservation_time,
-            status='pending_payment',
-            payment_method='gcash',
-            gcash_reference=gcash_reference,
-            payment_proof=payment_proof,
-            notes=notes
-        )
+        # Create reservation, holding the day's capacity
+        with transaction.atomic():
+            if not capacity.reserve(product, reservation_datetime.date(), quantity):
+                remaining = capacity.remaining(product, reservation_datetime.date())
+                messages.error(request, _capacity_message(product, reservation_datetime.date(), remaining))
+                return redirect('reservation_create', product_id=product_id)
+            reservation = Reservation.objects.create(
+                user=request.user,
+                product=product,
+                quantity=quantity,
+                total_amount=line.subtotal,
+                downpayment_amount=line.downpayment,
+                reservation_date=reservation_date,
+                reservation_time=reservation_time,
+                status='pending_payment',
+                payment_method='gcash',
+                gcash_reference=gcash_reference,
+                notes=notes
+            )
+        if payment_proof:
+            # Uploaded to Cloudinary by the worker, not inside the request
+            tasks.store_upload_later([reservation], 'payment_proof', payment_proof)
         # Notification automatically created by signal
         
         messages.success(request, f'✅ Reservation #{reservation.id} submitted successfully! Your reservation request has been received and is pending admin confirmation.')
+        mark_submitted(request)
         return redirect('reservation_list')
     
     # GET request - show form
@@ -404,7 +457,7 @@ def reservation_create(request, product_id):
     context = {
         'product': product,
         'gcash_number': gcash_number,
-        'downpayment_percent': 20,
+        'downpayment_percent': product.reservation_downpayment_percent,
     }
     return render(request, 'kakanin/reservation_form.html', context)
 
@@ -0,0 +1,92 @@
+"""
+Notification retention policies and batched deletion
+
+- Unread user notifications are kept forever
+- Read user notifications are kept NOTIFICATION_RETENTION_READ_DAYS days,
+  or the per-type override in NOTIFICATION_RETENTION_TYPE_DAYS
+- Admin notifications (user=None) are kept NOTIFICATION_RETENTION_ADMIN_DAYS
+  days whether or not every staff member has read them
+
+Rows are deleted in bounded batches, each in its own short transaction, so a
+large backlog never loads everything into memory or holds a long lock.
+``manage.py clean_notifications --apply`` applies the policies (safe to schedule).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+
+READ_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_READ_DAYS', 30)
+ADMIN_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_ADMIN_DAYS', 90)
+# e.g. {'low_stock': 7} to drop read low-stock notices sooner than READ_DAYS
+TYPE_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_TYPE_DAYS', {})
+
+BATCH_SIZE = 500
+
+
+def expired_querysets(now=None):
+    """(label, queryset) for each retention policy"""
+    now = now or timezone.now()
+    policies = [
+        ('admin', Notification.objects.filter(user__isnull=True, created_at__lt=now - timedelta(days=ADMIN_DAYS))),
+    ]
+    user_read = Notification.objects.filter(user__isnull=False, read=True)
+    for notification_type, days in TYPE_DAYS.items():
+        policies.append((
+            f'read {notification_type}',
+            user_read.filter(type=notification_type, created_at__lt=now - timedelta(days=days)),
+        ))
+    policies.append((
+        'read',
+        user_read.exclude(type__in=list(TYPE_DAYS)).filter(created_at__lt=now - timedelta(days=READ_DAYS)),
+    ))
+    return policies
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE, deadline=None, progress=None):
+    """
+    Delete the rows of queryset batch_size at a time
+    Stops early once time.monotonic() passes deadline. Calls progress(deleted_so_far)
+    after each batch. Returns (deleted, finished).
+    """
+    deleted = 0
+    while deadline is None or time.monotonic() < deadline:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted, True
+        with transaction.atomic():
+            # Receipts cascade too; the batch bounds what the collector loads
+            Notification.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if progress:
+            progress(deleted)
+    return deleted, False
+
+
+def purge_expired_notifications(batch_size=BATCH_SIZE, max_seconds=None, dry_run=False, progress=None):
+    """
+    Apply every retention policy
+    Returns a list of (label, count, finished): the rows deleted per policy, or
+    with dry_run the rows that would be deleted. progress(label, deleted) is
+    called after each batch.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    results = []
+    for label, queryset in expired_querysets():
+        if dry_run:
+            results.append((label, queryset.count(), True))
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            results.append((label, 0, False))
+            continue
+        deleted, finished = delete_in_batches(
+            queryset, batch_size, deadline,
+            (lambda count, label=label: progress(label, count)) if progress else None,
+        )
+        results.append((label, deleted, finished))
+    return results
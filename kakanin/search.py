@@ -0,0 +1,162 @@
+"""
+Ranked full-text product search
+
+    ids = search.search_product_ids('bibinka')   # best match first
+
+Product names and descriptions are indexed in a spelling-folded form (see
+normalize), so Filipino/English spelling variants such as "Bibingka" and
+"bibinka", "kutsinta" and "cutchinta" or "cassava" and "kasaba" match each
+other, and every query word is matched as a prefix for as-you-type search.
+
+The index lives in the database and is kept in sync by the Kakanin signals:
+- SQLite: FTS5 virtual table kakanin_product_fts, ranked with bm25
+- PostgreSQL: tsvector column kakanin_kakanin.search_vector with a GIN
+  index, ranked with ts_rank
+Other backends fall back to an unranked icontains filter.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+
+
+FTS_TABLE = 'kakanin_product_fts'
+
+# Name matches count for much more than description matches
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Order matters: multi-letter spellings first, then single letters
+_FOLDS = [
+    ('ch', 'ts'),
+    ('qu', 'k'),
+    ('ng', 'n'),
+    ('ph', 'p'),
+    ('x', 'ks'),
+    ('c', 'k'),
+    ('f', 'p'),
+    ('v', 'b'),
+    ('z', 's'),
+    ('j', 'h'),
+    ('e', 'i'),
+    ('o', 'u'),
+]
+_SOFT_C = re.compile(r'c(?=[eiy])')
+_DOUBLE = re.compile(r'(.)\1+')
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """
+    Fold text to a spelling-insensitive form for indexing and querying
+    Accents are removed, Spanish/English spellings are mapped to Filipino
+    ones (c/qu -> k, ch -> ts, f -> p, v -> b, z -> s), "ng" becomes "n",
+    e/i and o/u are merged and doubled letters are collapsed.
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    text = _SOFT_C.sub('s', text)
+    for spelling, folded in _FOLDS:
+        text = text.replace(spelling, folded)
+    return ' '.join(_DOUBLE.sub(r'\1', word) for word in _WORD.findall(text))
+
+
+class SQLiteBackend:
+    """FTS5 virtual table keyed by product id (rowid)"""
+
+    def index(self, product_id, name, description):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                [product_id, normalize(name), normalize(description)],
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def search(self, words, limit):
+        # "word"* is an FTS5 prefix query; words are implicitly ANDed
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s',
+                [match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLBackend:
+    """tsvector column on kakanin_kakanin (name weighted A, description B) with a GIN index"""
+
+    def index(self, product_id, name, description):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE kakanin_kakanin SET search_vector = "
+                "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') "
+                "WHERE id = %s",
+                [normalize(name), normalize(description), product_id],
+            )
+
+    def remove(self, product_id):
+        # The column goes away with the row
+        pass
+
+    def search(self, words, limit):
+        query = ' & '.join(f'{word}:*' for word in words)
+        weights = '{0, 0, %s, %s}' % (DESCRIPTION_WEIGHT / NAME_WEIGHT, 1.0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM kakanin_kakanin, to_tsquery('simple', %s) query "
+                "WHERE search_vector @@ query "
+                "ORDER BY ts_rank(%s::float4[], search_vector, query) DESC, id LIMIT %s",
+                [query, weights, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackBackend:
+    """Unranked icontains filter for databases without a full-text index"""
+
+    def index(self, product_id, name, description):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+    def search(self, words, limit, raw_query=''):
+        from .models import Kakanin
+
+        return list(
+            Kakanin.objects.filter(Q(name__icontains=raw_query) | Q(description__icontains=raw_query))
+            .order_by('name').values_list('id', flat=True)[:limit]
+        )
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteBackend()
+    if connection.vendor == 'postgresql':
+        return PostgreSQLBackend()
+    return FallbackBackend()
+
+
+def search_product_ids(query, limit=200):
+    """Ids of products matching query, best match first"""
+    words = normalize(query).split()
+    if not words:
+        return []
+    backend = get_backend()
+    if isinstance(backend, FallbackBackend):
+        return backend.search(words, limit, raw_query=query.strip())
+    return backend.search(words, limit)
+
+
+def index_product(product):
+    get_backend().index(product.id, product.name, product.description)
+
+
+def remove_product(product_id):
+    get_backend().remove(product_id)
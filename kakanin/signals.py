@@ -1,46 +1,37 @@
 """
 Signals for automatic notification creation
 """
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.contrib.auth.models import User
-from .models import Order, Reservation, Notification
-
-
-# Track previous status to detect changes
-@receiver(pre_save, sender=Order)
-def track_order_status_change(sender, instance, **kwargs):
-    """Track the previous status before saving"""
-    if instance.pk:
-        try:
-            instance._previous_status = Order.objects.get(pk=instance.pk).status
-        except Order.DoesNotExist:
-            instance._previous_status = None
-    else:
-        instance._previous_status = None
+from . import capacity, carousel, catalog, counters, events, jobs, search, tasks
+from .jobs import enqueue
+from .models import (
+    Order, Reservation, Notification, NotificationReceipt, Message, ReservationCart, ReservationCartItem,
+    Conversation, Kakanin, UserProfile, AboutPage, CarouselImage, KakaninCategory, OrderCart, OrderCartItem,
+)
 
 
-@receiver(pre_save, sender=Reservation)
-def track_reservation_status_change(sender, instance, **kwargs):
-    """Track the previous status before saving"""
-    if instance.pk:
-        try:
-            instance._previous_status = Reservation.objects.get(pk=instance.pk).status
-        except Reservation.DoesNotExist:
-            instance._previous_status = None
-    else:
-        instance._previous_status = None
+# Uploads that get responsive derivatives (images.py)
+RESPONSIVE_IMAGE_FIELDS = {
+    Kakanin: 'image',
+    UserProfile: 'profile_picture',
+    AboutPage: 'photo',
+    Message: 'image',
+}
 
 
 @receiver(post_save, sender=Order)
 def create_order_notifications(sender, instance, created, **kwargs):
     """
-    Create notifications when order status changes
+    Queue notifications when order status changes
     - New order: Notify admin
     - Status changes: Notify user
+    The notifications themselves are written by a worker (see tasks.py).
     """
-    # Get previous status if it exists
-    previous_status = getattr(instance, '_previous_status', None)
+    # Previous status as loaded from the database (FieldTrackerMixin, no query)
+    previous_status = instance.previous('status')
     current_status = instance.status
     
     # Skip if status hasn't changed (unless it's a new order)
@@ -49,79 +40,25 @@ def create_order_notifications(sender, instance, created, **kwargs):
     
     # NEW ORDER - Notify admin only
     if created:
-        customer_name = instance.user.get_full_name() or instance.user.username
-        
-        if instance.delivery:
-            # Delivery order with payment pending
-            Notification.objects.create(
-                type='payment_pending',
-                message=f'Order #{instance.id}: {customer_name} submitted a delivery order with downpayment. Please review.',
-                user=None,  # Admin notification
-                order=instance
-            )
-        else:
-            # Pickup order
-            Notification.objects.create(
-                type='order_submitted',
-                message=f'Order #{instance.id}: {customer_name} placed a pickup order.',
-                user=None,  # Admin notification
-                order=instance
-            )
+        enqueue(tasks.notify_order_created, instance.id)
         return
     
     # STATUS CHANGES - Notify user (but not if user cancelled their own order)
-    if previous_status != current_status:
-        # Skip notification if user cancelled their own order
-        skip_user_notification = getattr(instance, '_skip_user_notification', False)
-        if skip_user_notification:
-            return
-        
-        notification_map = {
-            'confirmed': {
-                'type': 'order_confirmed',
-                'message': f'Order #{instance.id}: Your order has been confirmed!'
-            },
-            'ready_for_pickup': {
-                'type': 'ready_for_pickup',
-                'message': f'Order #{instance.id}: Your order is ready for pickup.'
-            },
-            'out_for_delivery': {
-                'type': 'out_for_delivery',
-                'message': f'Order #{instance.id}: Your order is out for delivery.'
-            },
-            'completed': {
-                'type': 'order_completed',
-                'message': f'Order #{instance.id}: Your order has been completed. Thank you!'
-            },
-            'cancelled': {
-                'type': 'order_cancelled',
-                'message': f'Order #{instance.id}: Your order has been cancelled.'
-            },
-            'rejected': {
-                'type': 'payment_rejected',
-                'message': f'Order #{instance.id}: Your order payment was rejected.'
-            }
-        }
-        
-        if current_status in notification_map:
-            notif_data = notification_map[current_status]
-            Notification.objects.create(
-                type=notif_data['type'],
-                message=notif_data['message'],
-                user=instance.user,  # User notification
-                order=instance
-            )
+    if getattr(instance, '_skip_user_notification', False):
+        return
+    if current_status in tasks.ORDER_STATUS_NOTIFICATIONS:
+        enqueue(tasks.notify_order_status, instance.id, instance.user_id, current_status)
 
 
 @receiver(post_save, sender=Reservation)
 def create_reservation_notifications(sender, instance, created, **kwargs):
     """
-    Create notifications when reservation status changes
+    Queue notifications when reservation status changes
     - New reservation: Notify admin
     - Status changes: Notify user
     """
-    # Get previous status if it exists
-    previous_status = getattr(instance, '_previous_status', None)
+    # Previous status as loaded from the database (FieldTrackerMixin, no query)
+    previous_status = instance.previous('status')
     current_status = instance.status
     
     # Skip if status hasn't changed (unless it's a new reservation)
@@ -130,50 +67,179 @@ def create_reservation_notifications(sender, instance, created, **kwargs):
     
     # NEW RESERVATION - Notify admin only
     if created:
-        customer_name = instance.user.get_full_name() or instance.user.username
-        product_name = instance.product.name if instance.product else "Unknown Product"
-        
-        Notification.objects.create(
-            type='reservation_submitted',
-            message=f'Reservation #{instance.id}: {customer_name} submitted a reservation for {product_name} on {instance.reservation_date}.',
-            user=None,  # Admin notification
-            reservation=instance
-        )
+        enqueue(tasks.notify_reservation_created, instance.id)
         return
     
     # STATUS CHANGES - Notify user (but not if user cancelled their own reservation)
-    if previous_status != current_status:
-        # Skip notification if user cancelled their own reservation
-        skip_user_notification = getattr(instance, '_skip_user_notification', False)
-        if skip_user_notification:
-            return
-        
-        product_name = instance.product.name if instance.product else "your product"
-        
-        notification_map = {
-            'confirmed': {
-                'type': 'reservation_confirmed',
-                'message': f'Reservation #{instance.id}: Your reservation for {product_name} on {instance.reservation_date} at {instance.reservation_time} has been confirmed! Please proceed to payment.'
-            },
-            'rejected': {
-                'type': 'reservation_rejected',
-                'message': f'Reservation #{instance.id}: Your reservation for {product_name} was rejected.'
-            },
-            'completed': {
-                'type': 'reservation_completed',
-                'message': f'Reservation #{instance.id}: Your reservation has been completed. Thank you!'
-            },
-            'cancelled': {
-                'type': 'order_cancelled',
-                'message': f'Reservation #{instance.id}: Your reservation has been cancelled.'
-            }
-        }
-        
-        if current_status in notification_map:
-            notif_data = notification_map[current_status]
-            Notification.objects.create(
-                type=notif_data['type'],
-                message=notif_data['message'],
-                user=instance.user,  # User notification
-                reservation=instance
-            )
+    if getattr(instance, '_skip_user_notification', False):
+        return
+    if current_status in tasks.RESERVATION_STATUS_NOTIFICATIONS:
+        enqueue(tasks.notify_reservation_status, instance.id, current_status)
+
+
+# Keep cached navbar counters in step with the rows they count
+@receiver([post_save, post_delete], sender=Notification)
+def refresh_notification_counter(sender, instance, **kwargs):
+    """Drop the owner's unread notification count (admin count when user is null)"""
+    counters.invalidate(instance.user_id, counters.NOTIFICATIONS)
+
+
+@receiver([post_save, post_delete], sender=NotificationReceipt)
+def refresh_admin_notification_counter(sender, instance, **kwargs):
+    """Drop the staff member's unread admin notification count"""
+    counters.invalidate(instance.user_id, counters.ADMIN_NOTIFICATIONS)
+
+
+@receiver([post_save, post_delete], sender=Message)
+def refresh_message_counter(sender, instance, **kwargs):
+    """Drop the recipient's unread message count"""
+    counters.invalidate(instance.recipient_id, counters.MESSAGES)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_save(sender, instance, created, **kwargs):
+    """Keep the denormalized Conversation row in step with its messages"""
+    if not instance.sender_id:
+        # Guest contact-form messages have no thread
+        return
+    if created:
+        Conversation.record_message(instance)
+    else:
+        # Edited, unsent or read: recompute preview and unread counters
+        Conversation.refresh(instance.sender_id, instance.recipient_id)
+
+
+@receiver(post_delete, sender=Message)
+def update_conversation_on_delete(sender, instance, **kwargs):
+    if instance.sender_id:
+        Conversation.refresh(instance.sender_id, instance.recipient_id)
+
+
+@receiver(post_save, sender=Reservation)
+def update_daily_capacity(sender, instance, created, **kwargs):
+    """Release or complete the reservation's hold on its day (views hold it on create)"""
+    if not created:
+        capacity.on_status_change(instance, instance.previous('status'))
+
+
+@receiver(post_delete, sender=Reservation)
+def release_daily_capacity(sender, instance, **kwargs):
+    if instance.status in capacity.ACTIVE_STATUSES:
+        capacity.release(instance.product_id, instance.reservation_date, instance.quantity)
+
+
+@receiver([post_save, post_delete], sender=ReservationCartItem)
+def refresh_cart_counter(sender, instance, **kwargs):
+    """Drop the cart owner's reservation cart item count"""
+    if ReservationCartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        # Don't load the whole cart per item (e.g. the bulk delete at checkout)
+        user_id = ReservationCart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        counters.invalidate(user_id, counters.RESERVATION_CART)
+
+
+@receiver([post_save, post_delete], sender=OrderCartItem)
+def refresh_order_cart_counter(sender, instance, **kwargs):
+    """Drop the cart owner's order cart item count (the cart's key is its user's id)"""
+    counters.invalidate(instance.cart_id, counters.ORDER_CART)
+
+
+@receiver(user_logged_in)
+def migrate_session_cart(sender, request, user, **kwargs):
+    """Move a cart kept in the session by older versions into the user's OrderCart"""
+    if request is not None and 'cart' in request.session:
+        OrderCart.for_request(request)
+
+
+@receiver(request_started)
+def collect_inline_jobs(sender, **kwargs):
+    jobs.start_request()
+
+
+@receiver(request_finished)
+def run_inline_jobs(sender, **kwargs):
+    """Without a worker, run the request's jobs once its response is sent (jobs.py)"""
+    jobs.finish_request()
+
+
+@receiver(post_save, sender=Notification)
+def push_notification_event(sender, instance, created, **kwargs):
+    """Push new notifications to connected live-event streams"""
+    if created:
+        events.publish_notification(instance)
+
+
+@receiver(post_save, sender=Message)
+def push_message_event(sender, instance, created, **kwargs):
+    """Push new messages to the recipient's live-event streams"""
+    if created:
+        events.publish_message(instance)
+
+
+@receiver([post_save, post_delete], sender=Kakanin)
+def refresh_catalog(sender, instance, **kwargs):
+    """Products (including their stock) changed: serve a fresh cached catalog"""
+    catalog.bump_version()
+
+
+@receiver(post_save, sender=Kakanin)
+def index_product_for_search(sender, instance, **kwargs):
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Kakanin)
+def sync_product_categories(sender, instance, update_fields=None, **kwargs):
+    """Mirror Kakanin.categories into the indexed KakaninCategory rows"""
+    if update_fields is not None and 'categories' not in update_fields:
+        return
+    wanted = set(instance.categories or [])
+    existing = set(instance.category_rows.values_list('category', flat=True))
+    if wanted == existing:
+        return
+    instance.category_rows.filter(category__in=existing - wanted).delete()
+    KakaninCategory.objects.bulk_create(
+        KakaninCategory(product=instance, category=category) for category in wanted - existing
+    )
+
+
+@receiver(post_delete, sender=Kakanin)
+def remove_product_from_search(sender, instance, **kwargs):
+    search.remove_product(instance.id)
+
+
+@receiver(pre_save, sender=Kakanin)
+@receiver(pre_save, sender=UserProfile)
+@receiver(pre_save, sender=AboutPage)
+@receiver(pre_save, sender=Message)
+def detect_new_image(sender, instance, **kwargs):
+    """Remember whether this save stores a new upload (the file is written after pre_save)"""
+    field_file = getattr(instance, RESPONSIVE_IMAGE_FIELDS[sender])
+    instance._new_image = bool(field_file) and not field_file._committed
+
+
+@receiver(post_save, sender=Kakanin)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=AboutPage)
+@receiver(post_save, sender=Message)
+def queue_image_derivatives(sender, instance, **kwargs):
+    """Resize new uploads in a worker or process pool instead of serving the original everywhere"""
+    if getattr(instance, '_new_image', False):
+        instance._new_image = False
+        field_file = getattr(instance, RESPONSIVE_IMAGE_FIELDS[sender])
+        enqueue(tasks.generate_image_derivatives, sender._meta.label, field_file.name)
+
+
+@receiver(pre_save, sender=CarouselImage)
+def describe_carousel_image(sender, instance, **kwargs):
+    """Record size and placeholder color of a new carousel upload"""
+    if instance.image and not instance.image._committed:
+        upload = instance.image.file
+        instance.width, instance.height, instance.color = carousel.describe(upload)
+        upload.seek(0)
+
+
+@receiver([post_save, post_delete], sender=CarouselImage)
+def refresh_carousel(sender, instance, **kwargs):
+    carousel.invalidate()
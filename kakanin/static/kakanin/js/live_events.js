@@ -0,0 +1,14 @@
+// Listen to the server-sent events stream (views.live_events).
+// onEvent(type, data) is called for each "notification" and "message" event.
+// Returns the EventSource, or null when the stream is off (no url) or the
+// browser has no EventSource.
+function connectLiveEvents(url, onEvent) {
+  if (!url || !window.EventSource) return null;
+  const source = new EventSource(url);
+  ['notification', 'message'].forEach(function(type) {
+    source.addEventListener(type, function(e) {
+      onEvent(type, JSON.parse(e.data));
+    });
+  });
+  return source;
+}
@@ -0,0 +1,126 @@
+"""
+Atomic stock accounting for orders
+
+    result = stock.deduct_for_order(order)
+    if not result.ok:
+        for shortfall in result.shortfalls: ...   # nothing was deducted
+
+Every line is applied as a conditional UPDATE (stock = stock - qty WHERE
+stock >= qty) inside one transaction, so concurrent confirmations in
+different workers can never oversell or lose an update, and an order is
+either deducted in full or not at all. Rows are updated in product id order
+so two transactions touching the same products can't deadlock. The
+Kakanin stock check constraint is the last line of defence.
+
+Order.stock_deducted records whether an order currently holds stock, so
+restoring is done at most once and only for orders that were deducted.
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+
+from . import catalog
+from .models import Kakanin, Order
+
+
+class Shortfall:
+    """A line that could not be fulfilled"""
+
+    __slots__ = ('product_id', 'product_name', 'requested', 'available')
+
+    def __init__(self, product_id, product_name, requested, available):
+        self.product_id = product_id
+        self.product_name = product_name
+        self.requested = requested
+        self.available = available
+
+    def __str__(self):
+        return f'{self.product_name}: {self.requested} requested, only {self.available} available'
+
+
+class StockResult:
+    """Outcome of a stock operation: applied (ok) or rolled back with the shortfalls"""
+
+    def __init__(self, shortfalls=()):
+        self.shortfalls = list(shortfalls)
+
+    @property
+    def ok(self):
+        return not self.shortfalls
+
+    def message(self):
+        return 'Insufficient stock for ' + '; '.join(str(shortfall) for shortfall in self.shortfalls)
+
+
+def _lines(items):
+    """Sum quantities per product, in product id order"""
+    totals = {}
+    for product_id, quantity in items:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return OrderedDict(sorted(totals.items()))
+
+
+def deduct(items):
+    """
+    Take (product_id, quantity) pairs out of stock, all or nothing
+    Returns a StockResult listing every line that is short.
+    """
+    lines = _lines(items)
+    shortfalls = []
+    with transaction.atomic():
+        for product_id, quantity in lines.items():
+            updated = Kakanin.objects.filter(id=product_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity,
+            )
+            if not updated:
+                product = Kakanin.objects.filter(id=product_id).values('name', 'stock').first()
+                shortfalls.append(Shortfall(
+                    product_id,
+                    product['name'] if product else f'Product #{product_id}',
+                    quantity,
+                    product['stock'] if product else 0,
+                ))
+        if shortfalls:
+            # Keep checking the other lines for the report, then undo them all
+            transaction.set_rollback(True)
+            return StockResult(shortfalls)
+    catalog.bump_version()
+    return StockResult()
+
+
+def restore(items):
+    """Put (product_id, quantity) pairs back into stock"""
+    for product_id, quantity in _lines(items).items():
+        Kakanin.objects.filter(id=product_id).update(stock=F('stock') + quantity)
+    catalog.bump_version()
+
+
+def _order_items(order):
+    return order.items.values_list('product_id', 'quantity')
+
+
+def deduct_for_order(order):
+    """
+    Deduct an order's items and mark it stock_deducted, in one transaction
+    A no-op (ok) if the order already holds its stock.
+    """
+    with transaction.atomic():
+        if not Order.objects.filter(id=order.id, stock_deducted=False).update(stock_deducted=True):
+            return StockResult()
+        result = deduct(_order_items(order))
+        if not result.ok:
+            transaction.set_rollback(True)
+            return result
+    order.stock_deducted = True
+    return result
+
+
+def restore_for_order(order):
+    """Return an order's items to stock if (and only once) it was deducted"""
+    with transaction.atomic():
+        if not Order.objects.filter(id=order.id, stock_deducted=True).update(stock_deducted=False):
+            return False
+        restore(_order_items(order))
+    order.stock_deducted = False
+    return True
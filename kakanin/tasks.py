@@ -0,0 +1,173 @@
+"""
+Background jobs, run inline or by ``manage.py run_worker`` (see jobs.py)
+Jobs take ids and plain values, never model instances, and look rows up
+again when they run.
+"""
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from PIL import UnidentifiedImageError
+
+from . import catalog, images
+from .jobs import enqueue, task
+from .models import Order, Reservation, Notification
+
+
+@task
+def create_notification(notification_type, message, user_id=None, order_id=None, reservation_id=None):
+    """Create a notification (user_id=None for an admin notification)"""
+    Notification.objects.create(
+        type=notification_type,
+        message=message,
+        user_id=user_id,
+        order_id=order_id,
+        reservation_id=reservation_id,
+    )
+
+
+@task
+def notify_order_created(order_id):
+    """Tell admins about a new order"""
+    order = Order.objects.select_related('user').filter(id=order_id).first()
+    if order is None:
+        # Deleted before the job ran
+        return
+    customer_name = order.user.get_full_name() or order.user.username
+
+    if order.delivery:
+        # Delivery order with payment pending
+        create_notification(
+            'payment_pending',
+            f'Order #{order.id}: {customer_name} submitted a delivery order with downpayment. Please review.',
+            order_id=order.id,
+        )
+    else:
+        # Pickup order
+        create_notification(
+            'order_submitted',
+            f'Order #{order.id}: {customer_name} placed a pickup order.',
+            order_id=order.id,
+        )
+
+
+ORDER_STATUS_NOTIFICATIONS = {
+    'confirmed': ('order_confirmed', 'Order #{id}: Your order has been confirmed!'),
+    'ready_for_pickup': ('ready_for_pickup', 'Order #{id}: Your order is ready for pickup.'),
+    'out_for_delivery': ('out_for_delivery', 'Order #{id}: Your order is out for delivery.'),
+    'completed': ('order_completed', 'Order #{id}: Your order has been completed. Thank you!'),
+    'cancelled': ('order_cancelled', 'Order #{id}: Your order has been cancelled.'),
+    'rejected': ('payment_rejected', 'Order #{id}: Your order payment was rejected.'),
+}
+
+
+@task
+def notify_order_status(order_id, user_id, status):
+    """Tell the customer their order moved to ``status``"""
+    notification_type, message = ORDER_STATUS_NOTIFICATIONS[status]
+    if Order.objects.filter(id=order_id).exists():
+        create_notification(notification_type, message.format(id=order_id), user_id=user_id, order_id=order_id)
+
+
+@task
+def notify_reservation_created(reservation_id):
+    """Tell admins about a new reservation"""
+    reservation = Reservation.objects.select_related('user', 'product').filter(id=reservation_id).first()
+    if reservation is None:
+        return
+    customer_name = reservation.user.get_full_name() or reservation.user.username
+    product_name = reservation.product.name if reservation.product else "Unknown Product"
+
+    create_notification(
+        'reservation_submitted',
+        f'Reservation #{reservation.id}: {customer_name} submitted a reservation for {product_name} on {reservation.reservation_date}.',
+        reservation_id=reservation.id,
+    )
+
+
+@task
+def notify_reservation_status(reservation_id, status):
+    """Tell the customer their reservation moved to ``status``"""
+    reservation = Reservation.objects.select_related('product').filter(id=reservation_id).first()
+    if reservation is None:
+        return
+    product_name = reservation.product.name if reservation.product else "your product"
+
+    notification_map = {
+        'confirmed': {
+            'type': 'reservation_confirmed',
+            'message': f'Reservation #{reservation.id}: Your reservation for {product_name} on {reservation.reservation_date} at {reservation.reservation_time} has been confirmed! Please proceed to payment.'
+        },
+        'rejected': {
+            'type': 'reservation_rejected',
+            'message': f'Reservation #{reservation.id}: Your reservation for {product_name} was rejected.'
+        },
+        'completed': {
+            'type': 'reservation_completed',
+            'message': f'Reservation #{reservation.id}: Your reservation has been completed. Thank you!'
+        },
+        'cancelled': {
+            'type': 'order_cancelled',
+            'message': f'Reservation #{reservation.id}: Your reservation has been cancelled.'
+        }
+    }
+    notif_data = notification_map[status]
+    create_notification(
+        notif_data['type'], notif_data['message'],
+        user_id=reservation.user_id, reservation_id=reservation.id,
+    )
+
+
+RESERVATION_STATUS_NOTIFICATIONS = ('confirmed', 'rejected', 'completed', 'cancelled')
+
+
+# Uploads are parked on local disk until their job runs
+staged_uploads = FileSystemStorage(location=getattr(settings, 'JOBS_UPLOAD_DIR', 'job_uploads'))
+
+
+@task
+def store_upload(model_label, pks, field_name, filename, staged_name):
+    """
+    Save the staged upload once and point ``field_name`` of every row in pks at it
+    (uploads go to Cloudinary here, not in the request)
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk__in=pks).first()
+    if instance is not None:
+        field_file = getattr(instance, field_name)
+        with staged_uploads.open(staged_name) as staged:
+            field_file.save(filename, File(staged), save=False)
+        model.objects.filter(pk__in=pks).update(**{field_name: field_file.name})
+    # Only once stored: a failed attempt leaves it for the retry
+    staged_uploads.delete(staged_name)
+
+
+def store_upload_later(instances, field_name, uploaded_file):
+    """
+    Queue an uploaded file to be saved to ``field_name`` of instances (same model) by a worker
+    The file is staged in JOBS_UPLOAD_DIR and the job row only holds its name.
+    """
+    uploaded_file.seek(0)
+    staged_name = staged_uploads.save(os.path.basename(uploaded_file.name), uploaded_file)
+    enqueue(
+        store_upload, instances[0]._meta.label, [instance.pk for instance in instances],
+        field_name, uploaded_file.name, staged_name,
+    )
+
+
+@task(cpu_bound=True)
+def generate_image_derivatives(model_label, source):
+    """
+    Resize an uploaded image into its responsive derivatives (images.py)
+    CPU heavy: run inline it goes to the jobs process pool, and a worker
+    should use ``--pool process`` to use every core.
+    """
+    try:
+        images.generate(source)
+    except (FileNotFoundError, UnidentifiedImageError):
+        # Replaced/deleted before the job ran, or not an image; nothing to retry
+        return
+    if model_label == 'kakanin.Kakanin':
+        catalog.bump_version()
@@ -0,0 +1,17 @@
+"""
+{% load kakanin_forms %}
+<form method="post">{% csrf_token %}{% idempotency_field %} ...</form>
+"""
+from django import template
+from django.utils.html import format_html
+
+from .. import idempotency
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_field():
+    """Hidden one-time token for a view wrapped with idempotency.idempotent"""
+    return format_html('<input type="hidden" name="{}" value="{}">', idempotency.FIELD, idempotency.new_key())
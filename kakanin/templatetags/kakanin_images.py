@@ -0,0 +1,45 @@
+"""
+{% load kakanin_images %}
+{% responsive_image kakanin.image alt=kakanin.name class="w-full h-72 object-cover" sizes="50vw" %}
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from .. import images
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', size='card', **attrs):
+    """
+    <picture> for an ImageField file (or images.Picture) with WebP and JPEG srcsets
+    ``size`` picks the fallback src for browsers without srcset. Renders a plain
+    <img> of the original until its derivatives exist, and nothing without an image.
+    """
+    if not image:
+        return ''
+    variants = getattr(image, 'variants', None)
+    if variants is None:
+        variants = images.variants_for([image.name]).get(image.name, [])
+    img_attrs = format_html_join(' ', '{}="{}"', attrs.items())
+    if not variants:
+        return format_html('<img src="{}" alt="{}" {} loading="lazy" decoding="async">', image.url, alt, img_attrs)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime_type, images.srcset(variants, extension), sizes)
+            for extension, _, mime_type in images.FORMATS[:-1]
+        ),
+    )
+    fallback = images.FORMATS[-1][0]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" {} loading="lazy" decoding="async"></picture>',
+        sources,
+        images.variant_url(variants, size, fallback) or image.url,
+        images.srcset(variants, fallback),
+        sizes,
+        alt,
+        img_attrs,
+    )
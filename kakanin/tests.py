@@ -1,3 +1,79 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Notification, Message, Order, Reservation
+
+
+class HotFilterIndexTests(TestCase):
+    """EXPLAIN the hot navbar/admin queries and check they use the indexes from 0041"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer', password='x')
+        # Mostly read, per-user rows with a few admin ones, like production
+        Notification.objects.bulk_create(
+            [Notification(type='order_submitted', message='x', user=cls.user, read=True) for _ in range(50)]
+            + [Notification(type='feedback', message='x') for _ in range(3)]
+        )
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN output is only checked on SQLite and PostgreSQL')
+        with connection.cursor() as cursor:
+            # Give the planner statistics; without them it ignores partial indexes
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # Tables are tiny in tests; stop the planner preferring a seq scan
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f'Expected one of {index_names} in plan:\n{plan}',
+        )
+
+    def test_user_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, read=False).order_by('-created_at'),
+            'notification_user_unread', 'notification_user_read',
+        )
+
+    def test_admin_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user__isnull=True, read=False).order_by('-created_at'),
+            'notification_user_unread', 'notification_admin',
+        )
+
+    def test_admin_notification_list(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user__isnull=True).order_by('-created_at'),
+            'notification_admin',
+        )
+
+    def test_unread_messages(self):
+        self.assertUsesIndex(
+            Message.objects.filter(recipient=self.user, is_read=False),
+            'message_recipient_unread', 'message_recipient_read',
+        )
+
+    def test_message_thread(self):
+        self.assertUsesIndex(
+            Message.objects.filter(sender=self.user, recipient=self.user).order_by('-created_at'),
+            'message_thread',
+        )
+
+    def test_admin_orders_by_status(self):
+        self.assertUsesIndex(
+            Order.objects.filter(status='pending').order_by('created_at'),
+            'order_status_created',
+        )
+
+    def test_reservations_by_date(self):
+        self.assertUsesIndex(
+            Reservation.objects.filter(reservation_date__gte=date.today(), status='confirmed'),
+            'reservation_date_status',
+        )
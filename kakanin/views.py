@@ -7,13 +7,21 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.urls import reverse
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 from .forms import SignUpForm, PersonalInfoForm, CredentialsForm
+from . import availability, carousel, carts, catalog, counters, events, pricing, search, stock, tasks
+from .idempotency import idempotent, mark_submitted
+from .jobs import enqueue
+from .notification_utils import (
+    create_admin_notification, mark_admin_notification_as_read, mark_all_notifications_as_read,
+    get_notification_page, encode_cursor,
+)
 from .models import (
     Kakanin, AboutPage, ContactInfo,
-    UserProfile, Message, Feedback, Notification, Order, Reservation, Rating
+    UserProfile, Message, Conversation, Feedback, Notification, Order, OrderCart, OrderCartItem, Reservation, Rating
 )
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.db.models import Count, Sum, Q
+from django.db import transaction
+from django.db.models import Count, Sum, Q, Case, When
 from django.core.paginator import Paginator
 from datetime import date, timedelta, datetime, time
 from django.utils import timezone
@@ -21,7 +29,6 @@ import json
 from django.conf import settings
 from django.shortcuts import render
 from decimal import Decimal
-import os
 
 
 def _expire_overdue_reservations():
@@ -38,46 +45,21 @@ def storage_debug(request):
     })
 
 
-def can_order_now(product):
+def can_order_now(product, now=None):
     """
     Check if a product can be ordered right now based on time window.
     Returns True if current time is within order window, False otherwise.
+    Pages listing several products should use availability.annotate instead.
     """
-    if not product.allow_order_now:
-        return False
-    
-    # Use localtime to get the current time in the configured timezone
-    from django.utils import timezone as tz
-    now = tz.localtime(tz.now()).time()
-    
-    # If no time restrictions, allow ordering
-    if not product.available_from_time or not product.available_to_time:
-        return True
-    
-    # Check if current time is within the order window
-    result = product.available_from_time <= now <= product.available_to_time
-    
-    # Debug logging
-    print(f"DEBUG: Product={product.name}, Now={now}, Start={product.available_from_time}, End={product.available_to_time}, CanOrder={result}")
-    
-    return result
+    return availability.Schedule(product).can_order(now or availability.local_now())
 
 
-def get_order_status(product):
+def get_order_status(product, now=None):
     """
     Get the order status for a product.
     Returns: 'can_order', 'order_closed', or 'reservation_only'
     """
-    if 'reservation' in product.categories:
-        return 'reservation_only'
-    
-    if 'order_now' in product.categories:
-        if can_order_now(product):
-            return 'can_order'
-        else:
-            return 'order_closed'
-    
-    return 'can_order'
+    return availability.Schedule(product).order_status(now or availability.local_now())
 
 
 # ----------------- Static Pages -----------------
@@ -220,8 +202,8 @@ def shop_view(request):
     elif request.user.is_authenticated and request.user.is_superuser:
         return redirect('admin_products')
     else:
-        # Guest users - show guest shop
-        kakanins = Kakanin.objects.all()
+        # Guest users - show guest shop (cached catalog, no queries when warm)
+        kakanins = catalog.get_products()
         return render(request, "kakanin/shop.html", {
             "kakanins": kakanins,
             "is_admin": False,
@@ -235,21 +217,10 @@ def index_user(request):
     if request.user.is_superuser:
         return redirect("/admin/")
     
-    img_dir = os.path.join(settings.BASE_DIR, 'kakanin', 'static', 'kakanin', 'img')
-    exts = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg')
-    try:
-        files = [
-            f for f in os.listdir(img_dir)
-            if f.lower().endswith(exts) and 'logo' not in f.lower() and 'gcash' not in f.lower()
-        ]
-    except FileNotFoundError:
-        files = []
-    # Paths relative to the static root
-    kakanin_images = [f'kakanin/img/{name}' for name in files]
-
     context = {
         'user': request.user,
-        'kakanin_images': kakanin_images,
+        # Described once per process / cached; no filesystem access here
+        'kakanin_images': carousel.get_slides(),
     }
     return render(request, "kakanin/index_user.html", context)
 
@@ -260,40 +231,29 @@ def shop_user(request):
     if request.user.is_superuser:
         return redirect("/admin/")
     
-    # Get kakanin products that are available
-    from django.db.models import Q
-    kakanins = Kakanin.objects.filter(Q(is_available=True) | Q(available_today=True))
+    # Get kakanin products that are available (cached catalog, no queries when warm)
+    kakanins = [k for k in catalog.get_products() if k.is_available or k.available_today]
     
     # Search functionality from navbar
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        kakanins = kakanins.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        # Ranked full-text search; products keep the search ranking order
+        by_id = {k.id: k for k in kakanins}
+        kakanins = [by_id[pk] for pk in search.search_product_ids(search_query) if pk in by_id]
     
-    # Add order status to each product
+    # Add order status to each product (whole catalog against one "now")
+    kakanins = availability.annotate(kakanins)
+    # Product cards are fragment-cached on content version + order state
     for kakanin in kakanins:
-        kakanin.order_status = get_order_status(kakanin)
-        kakanin.can_order = can_order_now(kakanin)
+        kakanin.card_key = catalog.card_cache_key(kakanin)
     
     # Calculate total cart count (order cart + reservation cart)
-    from .models import ReservationCart, Notification, Message
-    order_cart_count = len(request.session.get('cart', {}))
-    reservation_cart, _ = ReservationCart.objects.get_or_create(user=request.user)
-    reservation_cart_count = reservation_cart.items.count()  # Count number of items, not quantity
+    counts = counters.get_counts(request.user)
+    order_cart_count = counts[counters.ORDER_CART]
+    reservation_cart_count = counts[counters.RESERVATION_CART]  # Count number of items, not quantity
     total_cart_count = order_cart_count + reservation_cart_count
-    
-    # Get unread notification count
-    unread_notifications_count = Notification.objects.filter(user=request.user, read=False).count()
-    
-    # Get unread message count
-    unread_messages_count = Message.objects.filter(recipient=request.user, is_read=False).count()
-    
-    # Debug output
-    print(f"DEBUG CART COUNT: Order={order_cart_count}, Reservation={reservation_cart_count}, Total={total_cart_count}")
-    print(f"DEBUG NOTIFICATIONS: Unread={unread_notifications_count}")
-    print(f"DEBUG MESSAGES: Unread={unread_messages_count}")
+    unread_notifications_count = counts[counters.NOTIFICATIONS]
+    unread_messages_count = counts[counters.MESSAGES]
 
     context = {
         'user': request.user,
@@ -304,6 +264,9 @@ def shop_user(request):
         'unread_notifications_count': unread_notifications_count,
         'unread_messages_count': unread_messages_count,
         'search_query': search_query,
+        'card_cache_timeout': catalog.CARD_TIMEOUT,
+        'shipping_fee': pricing.SHIPPING_FEE,
+        'free_shipping_extra': pricing.FREE_SHIPPING_EXTRA,
     }
     return render(request, "kakanin/shop_user.html", context)
 
@@ -376,17 +339,12 @@ def user_profile(request):
     notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:10]
     
     # Calculate total cart count (order cart + reservation cart)
-    from .models import ReservationCart
-    order_cart_count = len(request.session.get('cart', {}))
-    reservation_cart, _ = ReservationCart.objects.get_or_create(user=request.user)
-    reservation_cart_count = reservation_cart.items.count()
+    counts = counters.get_counts(request.user)
+    order_cart_count = counts[counters.ORDER_CART]
+    reservation_cart_count = counts[counters.RESERVATION_CART]
     total_cart_count = order_cart_count + reservation_cart_count
-    
-    # Get unread notification count
-    unread_notifications_count = Notification.objects.filter(user=request.user, read=False).count()
-    
-    # Get unread message count
-    unread_messages_count = Message.objects.filter(recipient=request.user, is_read=False).count()
+    unread_notifications_count = counts[counters.NOTIFICATIONS]
+    unread_messages_count = counts[counters.MESSAGES]
 
     context = {
         'user': request.user,
@@ -407,24 +365,112 @@ def user_profile(request):
     return render(request, "kakanin/user_profile.html", context)
 
 
+def _notification_json(notification, url, read):
+    return {
+        'id': notification.id,
+        'type': notification.type,
+        'type_display': notification.get_type_display(),
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+        'read': read,
+        'url': url,
+    }
+
+
+def _notification_feed_response(request, queryset, unread_count, url_name, read_attr):
+    """
+    JSON page of a notification feed
+    ``?before=<cursor>`` fetches the next (older) page, ``?since=<cursor>``
+    the notifications added after the newest one the client already has.
+    """
+    before = request.GET.get('before')
+    since = request.GET.get('since')
+    notifications, has_more = get_notification_page(queryset, before=before, since=since)
+
+    if since:
+        latest_cursor = encode_cursor(notifications[0]) if notifications else since
+        next_cursor = None
+    else:
+        latest_cursor = encode_cursor(notifications[0]) if notifications and not before else None
+        next_cursor = encode_cursor(notifications[-1]) if has_more else None
+
+    return JsonResponse({
+        'notifications': [
+            _notification_json(n, reverse(url_name, args=[n.id]), getattr(n, read_attr))
+            for n in notifications
+        ],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'latest_cursor': latest_cursor,
+        'unread_count': unread_count,
+    })
+
+
 @login_required
 def user_notifications(request):
-    """View all notifications for the user"""
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    
+    """View the user's notifications, one keyset page at a time"""
     # Mark all as read if requested
     if request.method == 'POST' and request.POST.get('action') == 'mark_all_read':
         Notification.objects.filter(user=request.user, read=False).update(read=True)
+        counters.invalidate(request.user.id, counters.NOTIFICATIONS)
         messages.success(request, 'All notifications marked as read.')
         return redirect('user_notifications')
     
+    before = request.GET.get('before')
+    notifications, has_more = get_notification_page(
+        Notification.objects.filter(user=request.user), before=before
+    )
     context = {
         'notifications': notifications,
-        'unread_count': Notification.objects.filter(user=request.user, read=False).count(),
+        'unread_count': counters.get_counts(request.user)[counters.NOTIFICATIONS],
+        'is_first_page': not before,
+        'next_cursor': encode_cursor(notifications[-1]) if has_more else None,
+        'latest_cursor': encode_cursor(notifications[0]) if notifications and not before else None,
+        'live_events_url': reverse('live_events') if events.ENABLED else '',
     }
     return render(request, "kakanin/notifications.html", context)
 
 
+@login_required
+def user_notifications_feed(request):
+    """JSON feed of the user's notifications for incremental loading"""
+    return _notification_feed_response(
+        request,
+        Notification.objects.filter(user=request.user),
+        counters.get_counts(request.user)[counters.NOTIFICATIONS],
+        'mark_notification_read',
+        'read',
+    )
+
+
+@login_required
+async def live_events(request):
+    """
+    Server-sent events stream of new notifications and messages for the user
+    Browsers reconnect on their own and resume from Last-Event-ID.
+    """
+    if not events.ENABLED:
+        # EventSource gives up on a 204; the pages fall back to their feeds
+        return HttpResponse(status=204)
+    user = await request.auser()
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def stream():
+        yield 'retry: 5000\n\n'
+        async for event in events.get_backend().listen(events.channels_for(user), last_event_id):
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            event_id, data = event
+            yield f"id: {event_id}\nevent: {data['type']}\ndata: {json.dumps(data)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def mark_notification_read(request, notification_id):
     """Mark a single notification as read"""
@@ -448,27 +494,43 @@ def mark_notification_read(request, notification_id):
 @staff_member_required
 def admin_notifications(request):
     """View all notifications for admin - shows only admin-specific notifications (user=null)"""
-    notifications = Notification.objects.filter(user__isnull=True).order_by('-created_at')
-    
     # Mark all as read if requested
     if request.method == 'POST' and request.POST.get('action') == 'mark_all_read':
-        Notification.objects.filter(user__isnull=True, read=False).update(read=True)
+        mark_all_notifications_as_read(request.user)
         messages.success(request, 'All notifications marked as read.')
         return redirect('admin_notifications')
     
+    # Read state is per staff member (see NotificationReceipt)
+    before = request.GET.get('before')
+    notifications, has_more = get_notification_page(Notification.admin_for(request.user), before=before)
     context = {
         'notifications': notifications,
-        'unread_count': Notification.objects.filter(user__isnull=True, read=False).count(),
+        'unread_count': counters.get_counts(request.user)[counters.ADMIN_NOTIFICATIONS],
+        'is_first_page': not before,
+        'next_cursor': encode_cursor(notifications[-1]) if has_more else None,
+        'latest_cursor': encode_cursor(notifications[0]) if notifications and not before else None,
+        'live_events_url': reverse('live_events') if events.ENABLED else '',
     }
     return render(request, "kakanin/admin_notifications.html", context)
 
 
+@staff_member_required
+def admin_notifications_feed(request):
+    """JSON feed of admin notifications for incremental loading"""
+    return _notification_feed_response(
+        request,
+        Notification.admin_for(request.user),
+        counters.get_counts(request.user)[counters.ADMIN_NOTIFICATIONS],
+        'admin_mark_notification_read',
+        'seen',
+    )
+
+
 @staff_member_required
 def admin_mark_notification_read(request, notification_id):
     """Mark a single notification as read (admin version) - only admin notifications"""
     notification = get_object_or_404(Notification, id=notification_id, user__isnull=True)
-    notification.read = True
-    notification.save()
+    mark_admin_notification_as_read(notification, request.user)
     
     # Redirect to the related page based on notification type
     if notification.order:
@@ -499,7 +561,7 @@ def admin_dashboard(request):
     total_users = User.objects.filter(is_superuser=False).count()
     
     # Notifications - only show admin notifications (user=null)
-    notifications = Notification.objects.filter(user__isnull=True, read=False).order_by('-created_at')[:10]
+    notifications = Notification.admin_unread_for(request.user).order_by('-created_at')[:10]
     
     # Order status distribution
     from django.db.models import Count, Sum, F
@@ -573,10 +635,11 @@ def admin_products(request):
     # Search functionality
     search_query = request.GET.get('search')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        # Ranked full-text search, best match first
+        ids = search.search_product_ids(search_query)
+        products = Kakanin.objects.filter(id__in=ids).order_by(
+            Case(*[When(id=pk, then=rank) for rank, pk in enumerate(ids)])
+        ) if ids else Kakanin.objects.none()
     
     # Pagination
     paginator = Paginator(products, 12)
@@ -1242,37 +1305,23 @@ def messages_inbox(request):
     received = Message.objects.filter(recipient=request.user).select_related('sender')
     sent = Message.objects.filter(sender=request.user).select_related('recipient')
 
-    # Build a list of recent correspondents with their latest message
-    # Key: user id, Value: dict(user, last_message, last_time)
-    threads = {}
-    # Consider both directions, ordered by newest first to make first hit the latest
-    for m in Message.objects.filter(
-        Q(sender=request.user) | Q(recipient=request.user)
-    ).select_related('sender', 'recipient').order_by('-created_at'):
-        other = m.sender if m.sender_id and m.sender_id != request.user.id else m.recipient
-        if other is None:
-            continue
-        if other.id not in threads:
-            # Online if active within last 5 minutes
-            last_login = getattr(other, 'last_login', None)
-            is_online = bool(last_login and (timezone.now() - last_login) <= timedelta(minutes=5))
-            
-            # Count unread messages from this user
-            unread_count = Message.objects.filter(
-                sender=other,
-                recipient=request.user,
-                is_read=False
-            ).count()
-            
-            threads[other.id] = {
-                'user': other,
-                'last_message': m,
-                'last_time': m.created_at,
-                'is_online': is_online,
-                'unread_count': unread_count,
-            }
-    # Preserve ordering by last_time desc
-    recent_threads = sorted(threads.values(), key=lambda x: x['last_time'], reverse=True)
+    # Recent correspondents come from the denormalized Conversation table,
+    # one row per thread, newest activity first
+    paginator = Paginator(Conversation.for_user(request.user), 20)
+    threads_page = paginator.get_page(request.GET.get('page'))
+    now = timezone.now()
+    recent_threads = []
+    for conversation in threads_page:
+        other = conversation.other_user(request.user)
+        # Online if active within last 5 minutes
+        last_login = getattr(other, 'last_login', None)
+        recent_threads.append({
+            'user': other,
+            'last_message': conversation.last_message,
+            'last_time': conversation.last_activity,
+            'is_online': bool(last_login and (now - last_login) <= timedelta(minutes=5)),
+            'unread_count': conversation.unread_for(request.user),
+        })
 
     # Keep lightweight recent users for compatibility (can be removed if not used)
     recent_users = [t['user'] for t in recent_threads[:10]]
@@ -1287,6 +1336,7 @@ def messages_inbox(request):
         'sent': sent[:50],
         'recent_users': recent_users,
         'recent_threads': recent_threads,
+        'threads_page': threads_page,
         'all_users': User.objects.all().order_by('username') if request.user.is_superuser else None,
         'admin_user': admin_user,
     }
@@ -1353,54 +1403,28 @@ def message_thread(request, user_id: int):
     thread_messages = filtered_messages
 
     # Mark incoming messages as read
-    Message.objects.filter(sender=other_user, recipient=request.user, is_read=False).update(is_read=True)
+    if Message.objects.filter(sender=other_user, recipient=request.user, is_read=False).update(is_read=True):
+        Conversation.mark_read(request.user, other_user)
+        counters.invalidate(request.user.id, counters.MESSAGES)
 
-    # Get all conversation threads for sidebar
-    from django.db.models import Max, Count, Case, When, IntegerField
-    
+    # Get conversation threads for sidebar
     if request.user.is_superuser:
-        # Admin sees all users they've messaged with
-        user_ids = Message.objects.filter(
-            Q(sender=request.user) | Q(recipient=request.user)
-        ).values_list('sender_id', 'recipient_id')
-        
-        all_user_ids = set()
-        for sender_id, recipient_id in user_ids:
-            if sender_id != request.user.id:
-                all_user_ids.add(sender_id)
-            if recipient_id != request.user.id:
-                all_user_ids.add(recipient_id)
-        
-        all_threads = []
-        for uid in all_user_ids:
-            u = User.objects.get(pk=uid)
-            last_msg = Message.objects.filter(
-                Q(sender=request.user, recipient=u) | Q(sender=u, recipient=request.user)
-            ).order_by('-created_at').first()
-            
-            unread = Message.objects.filter(sender=u, recipient=request.user, is_read=False).count()
-            
-            all_threads.append({
-                'other_user': u,
-                'last_message': last_msg,
-                'unread_count': unread
-            })
-        
-        all_threads.sort(key=lambda x: x['last_message'].created_at if x['last_message'] else timezone.now(), reverse=True)
+        # Admin sees the most recently active users they've messaged with
+        sidebar_page = Paginator(Conversation.for_user(request.user), 30).get_page(request.GET.get('page'))
+        all_threads = [{
+            'other_user': conversation.other_user(request.user),
+            'last_message': conversation.last_message,
+            'unread_count': conversation.unread_for(request.user),
+        } for conversation in sidebar_page]
     else:
         # Regular users only see admin
         admin_user = User.objects.filter(is_superuser=True).first()
         if admin_user:
-            last_msg = Message.objects.filter(
-                Q(sender=request.user, recipient=admin_user) | Q(sender=admin_user, recipient=request.user)
-            ).order_by('-created_at').first()
-            
-            unread = Message.objects.filter(sender=admin_user, recipient=request.user, is_read=False).count()
-            
+            conversation = Conversation.between(request.user, admin_user)
             all_threads = [{
                 'other_user': admin_user,
-                'last_message': last_msg,
-                'unread_count': unread
+                'last_message': conversation.last_message if conversation else None,
+                'unread_count': conversation.unread_for(request.user) if conversation else 0,
             }]
         else:
             all_threads = []
@@ -1548,10 +1572,10 @@ def submit_feedback(request):
         feedback = Feedback.objects.create(sender=request.user, body=body, category=category)
         
         # Notify admins about new feedback (user=None for admin notifications)
-        Notification.objects.create(
-            user=None,
-            type='feedback',
-            message=f"New feedback from {request.user.username}: {body[:50]}{'...' if len(body) > 50 else ''}"
+        enqueue(
+            tasks.create_notification,
+            'feedback',
+            f"New feedback from {request.user.username}: {body[:50]}{'...' if len(body) > 50 else ''}",
         )
         
         return redirect('messages_inbox')
@@ -1564,38 +1588,35 @@ def submit_feedback(request):
         feedback = Feedback.objects.create(sender=None, guest_name=guest_name, guest_email=guest_email, body=body, category=category)
         
         # Notify admins about new guest feedback (user=None for admin notifications)
-        Notification.objects.create(
-            user=None,
-            type='feedback',
-            message=f"New feedback from guest {guest_name} ({guest_email}): {body[:50]}{'...' if len(body) > 50 else ''}"
+        enqueue(
+            tasks.create_notification,
+            'feedback',
+            f"New feedback from guest {guest_name} ({guest_email}): {body[:50]}{'...' if len(body) > 50 else ''}",
         )
         
         return redirect('contact')
 
 
 # ---------------------------
-# Cart Management (Session-based)
+# Cart Management (OrderCart)
 # ---------------------------
 
 @login_required
 def add_to_cart(request, product_id):
-    """Add a product to the session-based cart"""
+    """Add a product to the user's order cart"""
     product = get_object_or_404(Kakanin, id=product_id)
     
     # Check if product is available
     if not product.is_available:
-        messages.error(request, 'This product is not available for order.')
-        return redirect('shop_user')
+        return carts.reply(request, False, 'This product is not available for order.', 'shop_user')
     
     # Check if product is closed (order time window has passed)
-    if 'order_now' in product.categories and not can_order_now(product):
-        messages.error(request, 'This product is currently closed and not available for order.')
-        return redirect('shop_user')
+    if availability.is_closed(product):
+        return carts.reply(request, False, 'This product is currently closed and not available for order.', 'shop_user')
     
     # Check stock availability
     if product.stock <= 0:
-        messages.error(request, 'This product is out of stock.')
-        return redirect('shop_user')
+        return carts.reply(request, False, 'This product is out of stock.', 'shop_user')
     
     # Get quantity from POST data (from modal) or default to 1
     quantity = 1
@@ -1613,64 +1634,53 @@ def add_to_cart(request, product_id):
         quantity = 1
     
     if quantity > product.stock:
-        messages.error(request, f'Cannot add {quantity} pieces. Only {product.stock} available.')
-        return redirect('shop_user')
-    
-    # Initialize cart in session if it doesn't exist
-    if 'cart' not in request.session:
-        request.session['cart'] = {}
+        return carts.reply(request, False, f'Cannot add {quantity} pieces. Only {product.stock} available.', 'shop_user')
     
-    cart = request.session['cart']
-    product_id_str = str(product_id)
+    cart = OrderCart.for_request(request)
     
     # Add or update product in cart
-    if product_id_str in cart:
+    cart_item, created = OrderCartItem.objects.get_or_create(
+        cart=cart,
+        product=product,
+        defaults={'quantity': quantity, 'order_type': order_type}
+    )
+    if created:
+        message = f'{product.name} ({quantity} pcs) added to cart!'
+    else:
         # Update quantity
-        new_quantity = cart[product_id_str]['quantity'] + quantity
+        new_quantity = cart_item.quantity + quantity
         if new_quantity > product.stock:
-            messages.error(request, f'Cannot add more. Only {product.stock} pieces available.')
-            return redirect('shop_user')
-        cart[product_id_str]['quantity'] = new_quantity
-        cart[product_id_str]['order_type'] = order_type
-        messages.success(request, f'Updated {product.name} quantity to {new_quantity} in cart.')
-    else:
-        cart[product_id_str] = {
-            'name': product.name,
-            'price': str(product.price),
-            'quantity': quantity,
-            'stock': product.stock,
-            'image': product.image.url if product.image else None,
-            'order_type': order_type
-        }
-        messages.success(request, f'{product.name} ({quantity} pcs) added to cart!')
-    
-    request.session.modified = True
+            return carts.reply(request, False, f'Cannot add more. Only {product.stock} pieces available.', 'shop_user')
+        cart_item.quantity = new_quantity
+        cart_item.order_type = order_type
+        cart_item.save(update_fields=['quantity', 'order_type'])
+        message = f'Updated {product.name} quantity to {new_quantity} in cart.'
     
     # Check if this is a "Buy Now" action
-    if request.method == 'POST' and request.POST.get('buy_now') == 'true':
-        return redirect('checkout_cart')
-    
-    return redirect('shop_user')
+    buy_now = request.method == 'POST' and request.POST.get('buy_now') == 'true'
+    return carts.reply(request, True, message, 'checkout_cart' if buy_now else 'shop_user', line=carts.order_line(cart_item))
 
 
 @login_required
 def view_cart_old(request):
     """View the shopping cart (old version - kept for compatibility)"""
-    cart = request.session.get('cart', {})
+    cart = OrderCart.for_request(request)
+    items = list(cart.items.select_related('product'))
     
     # Calculate totals
     cart_items = []
     subtotal = Decimal('0.00')
     
-    for product_id, item in cart.items():
-        item_total = Decimal(item['price']) * item['quantity']
+    for item in items:
+        product = item.product
+        item_total = item.get_subtotal()
         cart_items.append({
-            'product_id': product_id,
-            'name': item['name'],
-            'price': Decimal(item['price']),
-            'quantity': item['quantity'],
-            'stock': item.get('stock', 0),
-            'image': item.get('image'),
+            'product_id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'quantity': item.quantity,
+            'stock': product.stock,
+            'image': product.image.url if product.image else None,
             'total': item_total
         })
         subtotal += item_total
@@ -1678,7 +1688,7 @@ def view_cart_old(request):
     context = {
         'cart_items': cart_items,
         'subtotal': subtotal,
-        'cart_count': sum(item['quantity'] for item in cart.values())
+        'cart_count': cart.get_item_count(items)
     }
     return render(request, 'kakanin/cart.html', context)
 
@@ -1687,40 +1697,38 @@ def view_cart_old(request):
 def update_cart(request, product_id):
     """Update quantity of a product in cart"""
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        product_id_str = str(product_id)
+        cart = OrderCart.for_request(request)
+        cart_item = cart.items.select_related('product').filter(product_id=product_id).first()
         
-        if product_id_str not in cart:
-            messages.error(request, 'Product not found in cart.')
-            return redirect('view_cart')
+        if cart_item is None:
+            return carts.reply(request, False, 'Product not found in cart.', 'view_cart')
         
         try:
             new_quantity = int(request.POST.get('quantity', 1))
             
             if new_quantity <= 0:
-                messages.error(request, 'Quantity must be at least 1.')
-                return redirect('view_cart')
+                return carts.reply(request, False, 'Quantity must be at least 1.', 'view_cart')
             
             # Check stock availability and if product is closed
-            product = get_object_or_404(Kakanin, id=product_id)
+            product = cart_item.product
             
             # Check if product is closed (order time window has passed)
-            if 'order_now' in product.categories and not can_order_now(product):
-                messages.error(request, f'{product.name} is currently closed and cannot be updated. It will be removed from your cart.')
-                del cart[product_id_str]
-                request.session.modified = True
-                return redirect('view_cart')
+            if availability.is_closed(product):
+                cart_item.delete()
+                return carts.reply(
+                    request, False,
+                    f'{product.name} is currently closed and cannot be updated. It will be removed from your cart.',
+                    'view_cart', line=carts.order_line(cart_item, removed=True),
+                )
             
             if new_quantity > product.stock:
-                messages.error(request, f'Only {product.stock} pieces available.')
-                return redirect('view_cart')
+                return carts.reply(request, False, f'Only {product.stock} pieces available.', 'view_cart')
             
-            cart[product_id_str]['quantity'] = new_quantity
-            cart[product_id_str]['stock'] = product.stock
-            request.session.modified = True
-            messages.success(request, f'Updated {cart[product_id_str]["name"]} quantity.')
+            cart_item.quantity = new_quantity
+            cart_item.save(update_fields=['quantity'])
+            return carts.reply(request, True, f'Updated {product.name} quantity.', 'view_cart', line=carts.order_line(cart_item))
         except ValueError:
-            messages.error(request, 'Invalid quantity.')
+            return carts.reply(request, False, 'Invalid quantity.', 'view_cart')
     
     return redirect('view_cart')
 
@@ -1728,67 +1736,61 @@ def update_cart(request, product_id):
 @login_required
 def remove_from_cart(request, product_id):
     """Remove a product from cart"""
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
-    
-    if product_id_str in cart:
-        product_name = cart[product_id_str]['name']
-        del cart[product_id_str]
-        request.session.modified = True
-        messages.success(request, f'{product_name} removed from cart.')
-    else:
-        messages.error(request, 'Product not found in cart.')
+    cart = OrderCart.for_request(request)
+    cart_item = cart.items.select_related('product').filter(product_id=product_id).first()
     
-    return redirect('view_cart')
+    if cart_item is None:
+        return carts.reply(request, False, 'Product not found in cart.', 'view_cart')
+    
+    cart_item.delete()
+    return carts.reply(
+        request, True, f'{cart_item.product.name} removed from cart.', 'view_cart',
+        line=carts.order_line(cart_item, removed=True),
+    )
 
 
 @login_required
 def clear_cart(request):
     """Clear all items from cart"""
-    if 'cart' in request.session:
-        del request.session['cart']
-        request.session.modified = True
+    deleted, _ = OrderCart.for_request(request).items.all().delete()
+    if deleted:
         messages.success(request, 'Cart cleared successfully.')
     return redirect('view_cart')
 
 
 @login_required
+@idempotent('order_list')
 def checkout_cart(request):
     """Checkout and create orders from cart items"""
     from .models import OrderItem, ContactInfo
     
-    cart = request.session.get('cart', {})
+    cart = OrderCart.for_request(request)
+    cart_items = list(cart.items.select_related('product'))
     
-    if not cart:
+    if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('view_cart')
     
+    # The preview and the POST price the same snapshot, so they show and charge the same amounts
+    cart_snapshot = pricing.snapshot(cart_items)
+    
     if request.method == 'POST':
         delivery_option = request.POST.get('delivery_option')  # 'delivery' or 'pickup'
         notes = request.POST.get('notes', '').strip()
         
-        # Calculate totals
-        total_quantity = sum(item['quantity'] for item in cart.values())
-        subtotal = sum(Decimal(item['price']) * item['quantity'] for item in cart.values())
-        
-        # Determine delivery and shipping fee
+        # Totals, shipping fee and downpayment (pricing.py)
         is_delivery = (delivery_option == 'delivery')
-        shipping_fee = Decimal('0.00')
+        quote = pricing.quote_order(cart_snapshot, delivery=is_delivery)
         
-        if is_delivery:
-            # Add shipping fee if total quantity < 20
-            if total_quantity < 20:
-                shipping_fee = Decimal('50.00')  # Default shipping fee
-        
-        total_amount = subtotal
-        downpayment_amount = Decimal('0.00')
+        total_amount = quote.subtotal
+        shipping_fee = quote.shipping_fee
+        downpayment_amount = quote.downpayment
         payment_method = 'cash'
         gcash_reference = ''
         payment_proof = None
         
-        # Handle delivery payment (requires 50% downpayment via GCash)
+        # Handle delivery payment (requires a downpayment via GCash)
         if is_delivery:
-            downpayment_amount = (total_amount + shipping_fee) * Decimal('0.50')
             payment_method = 'gcash'
             gcash_reference = request.POST.get('gcash_reference', '').strip()
             payment_proof = request.FILES.get('payment_proof')
@@ -1813,7 +1815,31 @@ def checkout_cart(request):
                 messages.error(request, 'Payment proof file size must be less than 5MB.')
                 return redirect('checkout_cart')
         
-        # Create the order
+        # Validate every item (products came with the cart items), before any write
+        # (don't deduct stock yet - wait for admin confirmation)
+        now = availability.local_now()
+        order_items = []
+        for item, line in zip(cart_items, quote.lines):
+            product = item.product
+            
+            # Check if product is closed (order time window has passed)
+            if availability.is_closed(product, now):
+                messages.error(request, f'{product.name} is currently closed and cannot be ordered.')
+                return redirect('view_cart')
+            
+            # Verify stock availability
+            if product.stock < item.quantity:
+                messages.error(request, f'Not enough stock for {product.name}. Only {product.stock} available.')
+                return redirect('view_cart')
+            
+            order_items.append(OrderItem(
+                product=product,
+                quantity=item.quantity,
+                price=line.unit_price,
+                # bulk_create skips OrderItem.save(), which normally computes this
+                subtotal=line.subtotal,
+            ))
+        
         # Both pickup and delivery orders start as pending_confirmation
         # Admin must confirm before order is ready
         order_status = 'pending_confirmation'
@@ -1823,81 +1849,52 @@ def checkout_cart(request):
         else:
             success_message = 'Your pickup order has been submitted. Please wait for admin confirmation before pickup.'
         
-        order = Order.objects.create(
-            user=request.user,
-            status=order_status,
-            total_amount=total_amount,
-            downpayment_amount=downpayment_amount,
-            shipping_fee=shipping_fee,
-            payment_method=payment_method,
-            gcash_reference=gcash_reference,
-            payment_proof=payment_proof,
-            delivery=is_delivery,
-            notes=notes
-        )
-        
-        # Create order items (don't deduct stock yet - wait for admin confirmation)
-        for product_id, item in cart.items():
-            try:
-                product = Kakanin.objects.get(id=product_id)
-                
-                # Check if product is closed (order time window has passed)
-                if 'order_now' in product.categories and not can_order_now(product):
-                    messages.error(request, f'{product.name} is currently closed and cannot be ordered.')
-                    order.delete()
-                    return redirect('view_cart')
-                
-                # Verify stock availability
-                if product.stock < item['quantity']:
-                    messages.error(request, f'Not enough stock for {product.name}. Only {product.stock} available.')
-                    order.delete()
-                    return redirect('view_cart')
-                
-                # Create order item
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=item['quantity'],
-                    price=product.price,
-                    subtotal=product.price * item['quantity']
-                )
-                
-            except Kakanin.DoesNotExist:
-                messages.error(request, f'Product {item["name"]} no longer exists.')
-                order.delete()
-                return redirect('view_cart')
+        # Order, items, queued jobs (notification, upload) and the emptied cart commit together or not at all
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=request.user,
+                status=order_status,
+                total_amount=total_amount,
+                downpayment_amount=downpayment_amount,
+                shipping_fee=shipping_fee,
+                payment_method=payment_method,
+                gcash_reference=gcash_reference,
+                delivery=is_delivery,
+                notes=notes
+            )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+            if payment_proof:
+                # Uploaded to Cloudinary by the worker, not inside checkout
+                tasks.store_upload_later([order], 'payment_proof', payment_proof)
+            
+            # Clear cart after successful checkout
+            cart.items.all().delete()
         
         # Notification is automatically created by signal when order is created
         
-        # Clear cart after successful checkout
-        del request.session['cart']
-        request.session.modified = True
-        
         messages.success(request, f'Order #{order.id} placed successfully! {success_message}')
-        
+        mark_submitted(request)
         return redirect('order_detail', order_id=order.id)
     
     # GET request - show checkout page
-    cart_items = []
-    subtotal = Decimal('0.00')
-    total_quantity = 0
+    # Pickup and delivery quotes: the page switches between them without a round trip
+    quote = pricing.quote_order(cart_snapshot)
+    delivery_quote = pricing.quote_order(cart_snapshot, delivery=True)
     
-    for product_id, item in cart.items():
-        item_total = Decimal(item['price']) * item['quantity']
+    items = cart_items
+    cart_items = []
+    for item, line in zip(items, quote.lines):
+        product = item.product
         cart_items.append({
-            'product_id': product_id,
-            'name': item['name'],
-            'price': Decimal(item['price']),
-            'quantity': item['quantity'],
-            'image': item.get('image'),
-            'total': item_total
+            'product_id': product.id,
+            'name': product.name,
+            'price': line.unit_price,
+            'quantity': item.quantity,
+            'image': product.image.url if product.image else None,
+            'total': line.subtotal
         })
-        subtotal += item_total
-        total_quantity += item['quantity']
-    
-    # Calculate potential fees
-    shipping_fee = Decimal('50.00') if total_quantity < 20 else Decimal('0.00')
-    delivery_downpayment = (subtotal + shipping_fee) * Decimal('0.50')
     
     # Get GCash info from ContactInfo
     contact_info = ContactInfo.objects.first()
@@ -1905,10 +1902,11 @@ def checkout_cart(request):
     
     context = {
         'cart_items': cart_items,
-        'subtotal': subtotal,
-        'total_quantity': total_quantity,
-        'shipping_fee': shipping_fee,
-        'delivery_downpayment': delivery_downpayment,
+        'subtotal': quote.subtotal,
+        'total_quantity': quote.total_quantity,
+        'shipping_fee': delivery_quote.shipping_fee,
+        'delivery_downpayment': delivery_quote.downpayment,
+        'delivery_downpayment_percent': delivery_quote.downpayment_percent,
         'gcash_number': gcash_number,
     }
     return render(request, 'kakanin/checkout.html', context)
@@ -1949,11 +1947,11 @@ def order_detail(request, order_id):
                 
                 # Notify admins
                 # Create admin notification (user=None for admin notifications)
-                Notification.objects.create(
-                    type='order_completed',
-                    message=f'Order #{order.id}: {request.user.username} confirmed receipt of their order.',
-                    user=None,
-                    order=order
+                enqueue(
+                    tasks.create_notification,
+                    'order_completed',
+                    f'Order #{order.id}: {request.user.username} confirmed receipt of their order.',
+                    order_id=order.id,
                 )
                 
                 messages.success(request, 'Thank you! Your order has been marked as received.')
@@ -1993,11 +1991,11 @@ def cancel_reservation(request, reservation_id):
     
     # Notify all admins about the cancellation
     # Create admin notification (user=None for admin notifications)
-    Notification.objects.create(
-        type='reservation_cancelled',
-        message=f'Reservation #{reservation.id}: {request.user.get_full_name() or request.user.username} cancelled their reservation for {reservation.product.name}.',
-        user=None,
-        reservation=reservation
+    enqueue(
+        tasks.create_notification,
+        'reservation_cancelled',
+        f'Reservation #{reservation.id}: {request.user.get_full_name() or request.user.username} cancelled their reservation for {reservation.product.name}.',
+        reservation_id=reservation.id,
     )
     
     messages.success(request, f'Reservation #{reservation.id} has been cancelled.')
@@ -2015,25 +2013,23 @@ def cancel_order(request, order_id):
         return redirect('order_detail', order_id=order_id)
     
     if request.method == 'POST':
-        # Restore stock for all order items
-        for item in order.items.all():
-            product = item.product
-            product.stock += item.quantity
-            product.save()
-        
-        # Update order status
-        order.status = 'cancelled'
-        # Set flag to prevent user notification (since user is cancelling their own order)
-        order._skip_user_notification = True
-        order.save()
+        with transaction.atomic():
+            # Restore stock if it was already taken for this order (atomic F() updates)
+            stock.restore_for_order(order)
+            
+            # Update order status
+            order.status = 'cancelled'
+            # Set flag to prevent user notification (since user is cancelling their own order)
+            order._skip_user_notification = True
+            order.save()
         
         # Notify all admins about the cancellation
         # Create admin notification (user=None for admin notifications)
-        Notification.objects.create(
-            type='order_cancelled',
-            message=f'Order #{order.id}: {request.user.get_full_name() or request.user.username} cancelled their order.',
-            user=None,
-            order=order
+        enqueue(
+            tasks.create_notification,
+            'order_cancelled',
+            f'Order #{order.id}: {request.user.get_full_name() or request.user.username} cancelled their order.',
+            order_id=order.id,
         )
         
         messages.success(request, f'Order #{order.id} has been cancelled.')
@@ -2114,19 +2110,20 @@ def admin_order_detail(request, order_id):
         if action == 'confirm_payment':
             # Confirm payment and deduct stock with DB transaction
             if order.status == 'pending_confirmation':
-                from django.db import transaction
-                
                 try:
                     with transaction.atomic():
-                        # Deduct stock for all order items
-                        for item in order.items.all():
-                            product = item.product
-                            if product.stock >= item.quantity:
-                                product.stock -= item.quantity
-                                product.save()
-                            else:
-                                messages.error(request, f'Insufficient stock for {product.name}. Only {product.stock} available.')
-                                return redirect('admin_order_detail', order_id=order_id)
+                        # Lock the order so two admins can't confirm it at once (no-op on SQLite,
+                        # where the conditional updates in stock.py still prevent double deduction)
+                        order = Order.objects.select_for_update().get(id=order.id)
+                        if order.status != 'pending_confirmation':
+                            messages.error(request, 'Order is not pending confirmation.')
+                            return redirect('admin_order_detail', order_id=order_id)
+                        
+                        # Deduct stock for all order items, all or nothing
+                        result = stock.deduct_for_order(order)
+                        if not result.ok:
+                            messages.error(request, result.message())
+                            return redirect('admin_order_detail', order_id=order_id)
                         
                         # Update order status
                         if order.delivery:
@@ -2286,61 +2283,50 @@ from .reservation_views import (
 @login_required
 def unified_cart(request):
     """Unified cart view showing both order cart and reservation cart"""
-    from .models import ReservationCart, ReservationCartItem
+    from .models import ReservationCart
     
-    # Get order cart from session
-    cart = request.session.get('cart', {})
+    # Get order cart; items and their products in one query
+    cart = OrderCart.for_request(request)
     order_cart_items = []
     order_total = Decimal('0.00')
     closed_products = []
+    closed_ids = []
+    now = availability.local_now()
     
-    for product_id, item_data in cart.items():
-        try:
-            product = Kakanin.objects.get(id=product_id)
-            
-            # Check if product is closed (order time window has passed)
-            if 'order_now' in product.categories and not can_order_now(product):
-                closed_products.append(product.name)
-                continue
-            
-            quantity = item_data['quantity']
-            subtotal = product.price * quantity
-            order_cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal
-            })
-            order_total += subtotal
-        except Kakanin.DoesNotExist:
+    for item in cart.items.select_related('product'):
+        product = item.product
+        
+        # Check if product is closed (order time window has passed)
+        if availability.is_closed(product, now):
+            closed_products.append(product.name)
+            closed_ids.append(item.id)
             continue
+        
+        quantity = item.quantity
+        subtotal = item.get_subtotal()
+        order_cart_items.append({
+            'product': product,
+            'quantity': quantity,
+            'subtotal': subtotal
+        })
+        order_total += subtotal
     
     # Remove closed products from cart
     if closed_products:
-        cart_copy = cart.copy()
-        for product_id, item_data in cart_copy.items():
-            try:
-                product = Kakanin.objects.get(id=product_id)
-                if 'order_now' in product.categories and not can_order_now(product):
-                    del cart[product_id]
-            except Kakanin.DoesNotExist:
-                pass
-        
-        if closed_products:
-            request.session.modified = True
-            messages.warning(request, f'The following products are now closed and have been removed from your cart: {", ".join(closed_products)}')
+        cart.items.filter(id__in=closed_ids).delete()
+        messages.warning(request, f'The following products are now closed and have been removed from your cart: {", ".join(closed_products)}')
     
-    # Get reservation cart from database
+    # Get reservation cart from database; items and their products in one query
     reservation_cart, created = ReservationCart.objects.get_or_create(user=request.user)
-    reservation_cart_items = reservation_cart.items.select_related('product').all()
-    reservation_total = reservation_cart.get_total()
-    reservation_downpayment = reservation_cart.get_downpayment()
+    reservation_cart_items = list(reservation_cart.items.select_related('product'))
+    reservation_total, reservation_downpayment = reservation_cart.get_totals(reservation_cart_items)
     
     context = {
         'order_cart_items': order_cart_items,
         'order_cart_count': len(order_cart_items),
         'order_total': order_total,
         'reservation_cart_items': reservation_cart_items,
-        'reservation_cart_count': reservation_cart_items.count(),
+        'reservation_cart_count': len(reservation_cart_items),
         'reservation_total': reservation_total,
         'reservation_downpayment': reservation_downpayment,
     }
@@ -2410,15 +2396,13 @@ def rate_order(request, order_id):
             
             rating.save()
             
-            # Create notification for admin
-            admin_users = User.objects.filter(is_staff=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    type='feedback',
-                    message=f'{request.user.get_full_name() or request.user.username} rated Order #{order.id} with {rating.get_average_rating():.1f}/5 stars',
-                    user=admin,
-                    order=order
-                )
+            # Create one broadcast notification for all admins
+            enqueue(
+                tasks.create_notification,
+                'feedback',
+                f'{request.user.get_full_name() or request.user.username} rated Order #{order.id} with {rating.get_average_rating():.1f}/5 stars',
+                order_id=order.id,
+            )
             
             # Redirect with success parameter to show popup
             from django.urls import reverse
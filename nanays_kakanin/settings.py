@@ -106,6 +106,63 @@ DATABASES = {
     )
 }
 
+# ----------------------------------------------------
+# CACHE (per-process memory by default; point at a shared
+# backend such as Redis when running several workers)
+# ----------------------------------------------------
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "nanays-kakanin"),
+    }
+}
+
+# Seconds a cached navbar counter may live before it is recounted
+NAVBAR_COUNTERS_TIMEOUT = int(os.environ.get("NAVBAR_COUNTERS_TIMEOUT", "300"))
+
+# Seconds the cached shop catalog lives (it is also versioned on every product change)
+CATALOG_CACHE_TIMEOUT = int(os.environ.get("CATALOG_CACHE_TIMEOUT", "300"))
+
+# Seconds a rendered shop product card lives (its key changes with the product)
+PRODUCT_CARD_CACHE_TIMEOUT = int(os.environ.get("PRODUCT_CARD_CACHE_TIMEOUT", "86400"))
+
+# Delivery fee for order carts (kakanin.pricing); waived once the cart holds
+# DELIVERY_FREE_SHIPPING_EXTRA pieces more than its products' largest
+# delivery_min_quantity (the minimum for a delivery order at all)
+DELIVERY_SHIPPING_FEE = os.environ.get("DELIVERY_SHIPPING_FEE", "50.00")
+DELIVERY_FREE_SHIPPING_EXTRA = int(os.environ.get("DELIVERY_FREE_SHIPPING_EXTRA", "10"))
+
+# Seconds a checkout/reservation form token is honoured (kakanin.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", "86400"))
+
+# Server-sent events stream for notifications (kakanin.events). Each open
+# stream is a long-lived connection, so only enable it when serving
+# nanays_kakanin.asgi:application with ASGI workers; the sync gunicorn
+# workers from build.sh would be held one per tab. Off, the notification
+# pages poll their feeds instead.
+LIVE_EVENTS_ENABLED = os.environ.get("LIVE_EVENTS_ENABLED", "False") == "True"
+
+# Pub/sub for the live events stream: kakanin.events.DatabaseBackend works
+# across workers, kakanin.events.InProcessBackend for a single process
+LIVE_EVENTS_BACKEND = os.environ.get("LIVE_EVENTS_BACKEND", "kakanin.events.DatabaseBackend")
+
+# Background jobs (kakanin.jobs) are run by the web process once the response
+# has been sent, unless JOBS_RUN_INLINE=False, which needs
+# `manage.py run_worker` running next to the web server (see README.md)
+JOBS_RUN_INLINE = os.environ.get("JOBS_RUN_INLINE", "True") == "True"
+
+# Processes that run CPU-heavy jobs (image resizing) when jobs run inline
+JOBS_PROCESS_POOL_SIZE = int(os.environ.get("JOBS_PROCESS_POOL_SIZE", "2"))
+
+# Uploads wait here until their job stores them (kakanin.tasks); a worker
+# must run on the same machine to read them
+JOBS_UPLOAD_DIR = os.environ.get("JOBS_UPLOAD_DIR", str(BASE_DIR / "job_uploads"))
+
+# Notification retention (kakanin.retention, `manage.py clean_notifications --apply`):
+# unread user notifications are kept forever
+NOTIFICATION_RETENTION_READ_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_READ_DAYS", "30"))
+NOTIFICATION_RETENTION_ADMIN_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_ADMIN_DAYS", "90"))
+
 # ----------------------------------------------------
 # PASSWORDS
 # ----------------------------------------------------
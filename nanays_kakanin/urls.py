@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from kakanin import views
 from kakanin import reservation_views
+from kakanin import api_views
 from kakanin.views import storage_debug
 from django.conf import settings
 from django.conf.urls.static import static
@@ -19,18 +20,22 @@ urlpatterns = [
     path("guest/", views.index, name='index'),
     path("user/", views.index_user, name="index_user"),
     path("user/shop/", views.shop_user, name="shop_user"),
+    path("api/products/", api_views.api_products, name="api_products"),
 
     # New cartless preorder flow
 
     path("profile/", views.user_profile, name="user_profile"),
     path("notifications/", views.user_notifications, name="user_notifications"),
     path("notifications/<int:notification_id>/read/", views.mark_notification_read, name="mark_notification_read"),
+    path("notifications/feed/", views.user_notifications_feed, name="user_notifications_feed"),
+    path("events/", views.live_events, name="live_events"),
 
     
     # Admin URLs
    path("admin-dashboard/", views.admin_dashboard, name="admin_dashboard"),
    path("admin-notifications/", views.admin_notifications, name="admin_notifications"),
    path("admin-notifications/<int:notification_id>/read/", views.admin_mark_notification_read, name="admin_mark_notification_read"),
+   path("admin-notifications/feed/", views.admin_notifications_feed, name="admin_notifications_feed"),
    path("admin-products/", views.admin_products, name="admin_products"),
    path("admin-products/create/", views.admin_product_create, name="admin_product_create"),
    path("admin-products/<int:product_id>/edit/", views.admin_product_edit, name="admin_product_edit"),
@@ -106,6 +111,7 @@ urlpatterns = [
     
     # Reservation Cart
     path("reservation/cart/add/<int:product_id>/", views.add_to_reservation_cart, name="add_to_reservation_cart"),
+    path("reservation/capacity/<int:product_id>/", reservation_views.reservation_capacity, name="reservation_capacity"),
     path("reservation/cart/", views.reservation_cart, name="reservation_cart"),
     path("reservation/cart/remove/<int:item_id>/", views.remove_from_reservation_cart, name="remove_from_reservation_cart"),
     path("reservation/cart/update/<int:item_id>/", views.update_reservation_cart, name="update_reservation_cart"),